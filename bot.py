@@ -8,6 +8,8 @@ from discord.ext import commands
 from discord import app_commands
 from dotenv import dotenv_values
 
+from common.metrics import registry as metrics
+
 logging.basicConfig(
     level=logging.INFO,
     format="[%(asctime)s] %(levelname)s (%(name)s %(module)s) %(message)s",
@@ -18,12 +20,42 @@ intents = discord.Intents.default()
 intents.message_content = True
 intents.members = True
 
+
+class InstrumentedTree(app_commands.CommandTree):
+    """Arbre de commandes mesurant la durée de chaque commande d'application (voir on_app_command_completion)"""
+    
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        if interaction.type == discord.InteractionType.application_command and interaction.command:
+            interaction.extras['metrics_started'] = metrics.start('command', interaction.command.qualified_name)
+        return True
+    
+def finish_command_metrics(interaction: discord.Interaction, error: bool = False):
+    started = interaction.extras.pop('metrics_started', None)
+    if started is not None and interaction.command:
+        metrics.finish('command', interaction.command.qualified_name, started, error=error)
+
+
+class InstrumentedBot(commands.Bot):
+    """Bot mesurant la durée, les erreurs et les exécutions en cours de chaque listener de module"""
+    
+    async def _run_event(self, coro, event_name: str, *args, **kwargs) -> None:
+        cog = getattr(coro, '__self__', None)
+        if not isinstance(cog, commands.Cog):
+            return await super()._run_event(coro, event_name, *args, **kwargs)
+        
+        async def tracked(*args, **kwargs):
+            with metrics.track('listener', f'{cog.qualified_name}.{coro.__name__}'):
+                await coro(*args, **kwargs)
+        await super()._run_event(tracked, event_name, *args, **kwargs)
+        
+
 async def main():
-    bot = commands.Bot(
+    bot = InstrumentedBot(
        command_prefix=commands.when_mentioned,
         description="Bot multifonction modulaire français, basé sur NERON",
         help_command=None,
-        intents=intents 
+        intents=intents,
+        tree_cls=InstrumentedTree
     )
     bot.config = dotenv_values('.env')
     
@@ -47,8 +79,13 @@ async def main():
             print("> Invite : {}".format(discord.utils.oauth_url(int(bot.config["APP_ID"]), permissions=discord.Permissions(int(bot.config['PERMISSIONS_INT'])))))
             print("-------------------")
     
+        @bot.event
+        async def on_app_command_completion(interaction: discord.Interaction, command):
+            finish_command_metrics(interaction)
+    
         @bot.tree.error
         async def on_command_error(interaction: discord.Interaction, error):
+            finish_command_metrics(interaction, error=True)
             if isinstance(error, app_commands.errors.CommandOnCooldown):
                 minutes, seconds = divmod(error.retry_after, 60)
                 hours, minutes = divmod(minutes, 60)
@@ -10,9 +10,10 @@ from discord.ext import commands
 from tabulate import tabulate
 from io import BytesIO
 
-from PIL import Image, ImageDraw, ImageFont, ImageOps
+from PIL import Image, ImageDraw, ImageOps
 
 from common.dataio import get_sqlite_database, get_package_path
+from common.utils.fonts import get_font, preload_fonts
 
 logger = logging.getLogger('ctrlshift.Colors')
 
@@ -20,6 +21,14 @@ DEFAULT_SETTINGS = {
     'beacon_id': 0 # Rôle qui sert de balise pour mettre les rôles de couleur en dessous
 }
 
+# Polices utilisées par les rendus (chemin, taille, encodage), chargées au démarrage du module
+RENDER_FONTS = [
+    (get_package_path('colors') + '/gg_sans.ttf', 20, ''),
+    (get_package_path('colors') + '/gg_sans.ttf', 18, ''),
+    (get_package_path('colors') + '/gg_sans_light.ttf', 14, ''),
+    (get_package_path('colors') + '/RobotoRegular.ttf', 18, '')
+]
+
 class ChooseColorMenu(discord.ui.View):
     def __init__(self, cog: 'Colors', initial_interaction: discord.Interaction, colors: List[colorgram.Color], previews: List[Image.Image]):
         super().__init__(timeout=60)
@@ -113,6 +122,9 @@ class Colors(commands.GroupCog, group_name='color', description='Gestion des rô
     def __init__(self, bot: commands.Bot):
         self.bot = bot
         
+    async def cog_load(self):
+        preload_fonts(RENDER_FONTS)
+        
     @commands.Cog.listener()
     async def on_ready(self):
         """Initialise la base de données"""
@@ -286,9 +298,9 @@ class Colors(commands.GroupCog, group_name='color', description='Gestion des rô
         d = ImageDraw.Draw(image)
         if with_text:
             if sum(color) < 382:
-                d.text((10, 10), f"#{color}", fill=(255, 255, 255), font=ImageFont.truetype(font_path, 20))
+                d.text((10, 10), f"#{color}", fill=(255, 255, 255), font=get_font(font_path, 20))
             else:
-                d.text((10, 10), f"#{color}", fill=(0, 0, 0), font=ImageFont.truetype(font_path, 20))
+                d.text((10, 10), f"#{color}", fill=(0, 0, 0), font=get_font(font_path, 20))
         return image
     
     def color_embed(self, color: str, text: str) -> discord.Embed:
@@ -321,10 +333,10 @@ class Colors(commands.GroupCog, group_name='color', description='Gestion des rô
             bg = Image.new("RGBA", (320, 94), v)
             bg.paste(avatar, (10, 10), avatar)
             d = ImageDraw.Draw(bg)
-            avatar_font = ImageFont.truetype("cogs/packages/colors/gg_sans.ttf", 18)
+            avatar_font = get_font(get_package_path('colors') + '/gg_sans.ttf', 18)
             d.text((74, 14), user.display_name, font=avatar_font, fill=name_color)
         
-            content_font = ImageFont.truetype("cogs/packages/colors/gg_sans_light.ttf", 14)
+            content_font = get_font(get_package_path('colors') + '/gg_sans_light.ttf', 14)
             text_color = (255, 255, 255) if v == (54, 57, 63) else (0, 0, 0)
             d.text((74, 40), "Ceci est une représentation simulée\nde la couleur qu'aurait votre pseudo", font=content_font, fill=text_color)
             images.append(bg)
@@ -352,7 +364,7 @@ class Colors(commands.GroupCog, group_name='color', description='Gestion des rô
         image = ImageOps.contain(image, (500, 500))
         iw, ih = image.size
         w, h = (iw + 100, ih)
-        font = ImageFont.truetype('cogs/packages/colors/RobotoRegular.ttf', 18)   
+        font = get_font(get_package_path('colors') + '/RobotoRegular.ttf', 18)   
         palette = Image.new('RGBA', (w, h), color='white')
         maxcolors = h // 30
         if len(colors) > maxcolors:
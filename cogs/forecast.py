@@ -1,19 +1,29 @@
+import asyncio
+import bisect
+import io
 import logging
 import time
+import unicodedata
 import iso3166
+from array import array
+from collections import Counter, OrderedDict, defaultdict
+from pathlib import Path
 from copy import copy
 from datetime import datetime, timezone
-from typing import Any, List, Optional
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 import discord
+import numpy as np
 import requests
 import json
 from discord import app_commands
-from discord.ext import commands
+from discord.ext import commands, tasks
+from PIL import Image, ImageDraw, ImageFont
 from tabulate import tabulate
 
 from common.utils import pretty, fuzzy
-from common.dataio import get_sqlite_database
+from common.dataio import get_sqlite_database, get_package_path
+from common.workers import run_in_process
 
 logger = logging.getLogger('ctrlshift.Forecast')
 
@@ -21,12 +31,216 @@ DEFAULT_SETTINGS = [
     ('OWMAPIKey', '')
 ]
 
+CACHE_TTL_CURRENT = 600 # Données actuelles (secondes)
+CACHE_TTL_WEEK = 1800 # Prévisions J-5 (secondes)
+GEOCODE_CACHE_SIZE = 256
+
+PREWARM_TOP_N = 10 # Nombre de villes populaires maintenues en cache
+PREWARM_INTERVAL = 5 # Minutes entre deux passages de préchauffage
+PREWARM_SPACING = 2.0 # Secondes entre deux appels à l'API lors du préchauffage (quota de 60 appels/min)
+POPULARITY_DECAY = 0.95 # Facteur appliqué aux compteurs de popularité à chaque passage
+POPULARITY_MAX_TRACKED = 500
+
+DEFAULT_API_URL = 'https://api.openweathermap.org' # Remplaçable via OWM_API_URL dans le .env (ex. serveur de test local)
+
+GAZETTEER_FILE = 'cities15000.txt' # Export GeoNames (https://download.geonames.org/export/dump/)
+
+CHART_CACHE_SIZE = 64
+CHART_FONT = get_package_path('quotes') + '/Roboto-Regular.ttf'
+
+
+def normalize_place_name(text: str) -> str:
+    """Normalise un nom de lieu (minuscules, sans accents ni ponctuation superflue)"""
+    text = unicodedata.normalize('NFKD', text)
+    text = ''.join(c for c in text if not unicodedata.combining(c))
+    return ' '.join(text.lower().replace('-', ' ').replace("'", ' ').split())
+
+
+class Gazetteer:
+    """Index local et compact des villes d'un export GeoNames
+
+    Les noms normalisés sont triés pour la recherche par préfixe (bisect) et découpés en trigrammes pour tolérer les fautes de frappe.
+    """
+    
+    def __init__(self):
+        self.names : List[str] = []
+        self.countries : List[str] = []
+        self.lats = array('f')
+        self.lons = array('f')
+        self.populations = array('L')
+        
+        self._keys : List[str] = []
+        self._key_ids = array('L')
+        self._exact : Dict[str, List[int]] = {}
+        self._trigrams : Dict[str, array] = {}
+        
+    def __len__(self) -> int:
+        return len(self.names)
+    
+    @staticmethod
+    def _trigrams_of(key: str) -> set:
+        padded = f'  {key} '
+        return {padded[i:i + 3] for i in range(len(padded) - 2)}
+        
+    @classmethod
+    def load(cls, path: Path) -> 'Gazetteer':
+        """Charge un fichier au format GeoNames (cities500/1000/5000/15000.txt)"""
+        gaz = cls()
+        entries = []
+        trigrams = defaultdict(lambda: array('L'))
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                cols = line.rstrip('\n').split('\t')
+                if len(cols) < 15:
+                    continue
+                idx = len(gaz.names)
+                gaz.names.append(cols[1])
+                gaz.countries.append(cols[8])
+                gaz.lats.append(float(cols[4]))
+                gaz.lons.append(float(cols[5]))
+                gaz.populations.append(int(cols[14] or 0))
+                for key in {normalize_place_name(cols[1]), normalize_place_name(cols[2])}:
+                    if not key:
+                        continue
+                    entries.append((key, idx))
+                    gaz._exact.setdefault(key, []).append(idx)
+                    for tri in cls._trigrams_of(key):
+                        trigrams[tri].append(idx)
+        entries.sort()
+        gaz._keys = [k for k, _ in entries]
+        gaz._key_ids = array('L', (i for _, i in entries))
+        gaz._trigrams = dict(trigrams)
+        return gaz
+    
+    def to_location(self, idx: int) -> dict:
+        return {'name': self.names[idx], 'lat': round(self.lats[idx], 4), 'lon': round(self.lons[idx], 4), 'country': self.countries[idx]}
+    
+    def resolve(self, city: str, country: str = '') -> Optional[dict]:
+        """Renvoie la ville la plus peuplée portant exactement ce nom (et dans ce pays si précisé)"""
+        ids = self._exact.get(normalize_place_name(city), [])
+        if country:
+            ids = [i for i in ids if self.countries[i] == country.upper()]
+        if not ids:
+            return None
+        return self.to_location(max(ids, key=lambda i: self.populations[i]))
+    
+    def search(self, query: str, country: str = '', limit: int = 10) -> List[int]:
+        """Recherche les villes commençant par la requête, puis les plus proches par trigrammes"""
+        key = normalize_place_name(query)
+        if not key:
+            return []
+        
+        found = set()
+        start = bisect.bisect_left(self._keys, key)
+        for pos in range(start, min(start + 500, len(self._keys))):
+            if not self._keys[pos].startswith(key):
+                break
+            found.add(self._key_ids[pos])
+        if country:
+            found = {i for i in found if self.countries[i] == country.upper()}
+        results = sorted(found, key=lambda i: self.populations[i], reverse=True)[:limit]
+        
+        if len(results) < limit and len(key) >= 3:
+            scores = Counter()
+            for tri in self._trigrams_of(key):
+                scores.update(self._trigrams.get(tri, ()))
+            threshold = len(self._trigrams_of(key)) // 2
+            fuzzy_ids = [i for i, score in scores.items() if score >= threshold and i not in found and (not country or self.countries[i] == country.upper())]
+            fuzzy_ids.sort(key=lambda i: (scores[i], self.populations[i]), reverse=True)
+            results.extend(fuzzy_ids[:limit - len(results)])
+        return results
+
+
+def render_week_chart(temps: List[float], precipitations: List[float], day_marks: List[Tuple[int, str]], font_path: str) -> bytes:
+    """Dessine le graphique des prévisions J-5 (courbe de température et barres de précipitations) et renvoie le PNG
+
+    Exécutée dans le pool de processus : uniquement des arguments et un résultat sérialisables
+    """
+    w, h = (800, 300)
+    left, right, top, bottom = (48, w - 16, 20, h - 36)
+    plot_h = bottom - top
+    
+    temps_arr = np.asarray(temps, dtype=float)
+    precip_arr = np.asarray(precipitations, dtype=float)
+    xs = np.linspace(left, right, len(temps_arr))
+    tmin, tmax = np.floor(temps_arr.min()) - 1, np.ceil(temps_arr.max()) + 1
+    ys = top + (tmax - temps_arr) / (tmax - tmin) * plot_h
+    bar_heights = precip_arr / max(precip_arr.max(), 1.0) * plot_h * 0.4
+    bar_w = max(2, (right - left) / len(temps_arr) * 0.6)
+    
+    img = Image.new('RGB', (w, h), (47, 49, 54))
+    draw = ImageDraw.Draw(img)
+    font = ImageFont.truetype(font_path, 14)
+    
+    for value in np.linspace(tmin, tmax, 5):
+        y = top + (tmax - value) / (tmax - tmin) * plot_h
+        draw.line([(left, y), (right, y)], fill=(64, 68, 75))
+        draw.text((left - 6, y), f"{value:.0f}°", font=font, fill=(185, 187, 190), anchor='rm')
+    for index, label in day_marks:
+        x = xs[index]
+        draw.line([(x, top), (x, bottom)], fill=(79, 84, 92))
+        draw.text((x + 4, bottom + 8), label, font=font, fill=(185, 187, 190), anchor='lt')
+    for x, bh in zip(xs, bar_heights):
+        if bh > 0:
+            draw.rectangle([(x - bar_w / 2, bottom - bh), (x + bar_w / 2, bottom)], fill=(52, 152, 219))
+    draw.line(list(zip(xs.tolist(), ys.tolist())), fill=(241, 196, 15), width=3, joint='curve')
+    
+    with io.BytesIO() as buffer:
+        img.save(buffer, format='PNG')
+        return buffer.getvalue()
+
         
 class Forecast(commands.GroupCog, group_name='weather', description='Commandes de prévision météo'):
     """Commandes de prévision météo"""
 
     def __init__(self, bot: commands.Bot):
         self.bot = bot
+        self.api_url = bot.config.get('OWM_API_URL') or DEFAULT_API_URL
+        
+        self._cache : Dict[Tuple[str, Tuple[float, float]], Tuple[float, dict]] = {}
+        self._geocode_cache : OrderedDict[Tuple[str, str], dict] = OrderedDict()
+        self._inflight : Dict[tuple, asyncio.Future] = {}
+        self._chart_cache : OrderedDict[tuple, bytes] = OrderedDict()
+        
+        self._popularity : Counter = Counter()
+        self._popular_locations : Dict[Tuple[float, float], dict] = {}
+        
+        self.gazetteer = Gazetteer()
+        
+        self.task_prewarm.start()
+        
+    async def cog_load(self):
+        path = Path(get_package_path('forecast')) / GAZETTEER_FILE
+        if not path.exists():
+            logger.info(f"Aucun index de villes local ({path}), l'autocomplétion des villes est désactivée (voir tools/fetch_gazetteer.py)")
+            return
+        self.gazetteer = await asyncio.to_thread(Gazetteer.load, path)
+        logger.info(f"Index de villes local chargé ({len(self.gazetteer)} villes)")
+        
+    def cog_unload(self):
+        self.task_prewarm.cancel()
+        
+    @tasks.loop(minutes=PREWARM_INTERVAL)
+    async def task_prewarm(self):
+        """Rafraîchit en arrière-plan les données des villes les plus demandées avant leur expiration"""
+        for key, _ in self._popularity.most_common(PREWARM_TOP_N):
+            loc = self._popular_locations[key]
+            for kind, fetcher, ttl in (('current', self.get_current_weather, CACHE_TTL_CURRENT), ('week', self.get_week_weather, CACHE_TTL_WEEK)):
+                entry = self._cache.get((kind, key))
+                if entry and entry[0] - time.time() > PREWARM_INTERVAL * 60:
+                    continue # Toujours valide au prochain passage
+                try:
+                    await self._cached_fetch(kind, loc, fetcher, ttl, force=True)
+                except Exception as e:
+                    logger.warning(f"Erreur lors du préchauffage de {loc['name']} ({kind}) : {e}")
+                await asyncio.sleep(PREWARM_SPACING)
+        
+        self._decay_popularity()
+        self._prune_cache()
+        
+    @task_prewarm.before_loop
+    async def before_prewarm(self):
+        await self.bot.wait_until_ready()
         
     @commands.Cog.listener()
     async def on_ready(self):
@@ -80,9 +294,9 @@ class Forecast(commands.GroupCog, group_name='weather', description='Commandes d
     def get_geocode(self, city: str, country: str = '') -> Optional[dict]:
         api_key = self.get_setting('OWMAPIKey')
         if country:
-            url = f"http://api.openweathermap.org/geo/1.0/direct?q={city},{country}&appid={api_key}"
+            url = f"{self.api_url}/geo/1.0/direct?q={city},{country}&appid={api_key}"
         else:
-            url = f"http://api.openweathermap.org/geo/1.0/direct?q={city}&appid={api_key}"
+            url = f"{self.api_url}/geo/1.0/direct?q={city}&appid={api_key}"
         try:
             response = requests.get(url)
             if response.status_code == 200:
@@ -94,12 +308,109 @@ class Forecast(commands.GroupCog, group_name='weather', description='Commandes d
             logger.error(e)
             return None
         
+    # Cache ------------------------------------------------------------------
+    
+    def _location_key(self, loc: dict) -> Tuple[float, float]:
+        return (round(loc['lat'], 2), round(loc['lon'], 2))
+    
+    def _track_query(self, loc: dict):
+        key = self._location_key(loc)
+        self._popularity[key] += 1
+        self._popular_locations[key] = loc
+        
+    def _decay_popularity(self):
+        for key in list(self._popularity):
+            self._popularity[key] *= POPULARITY_DECAY
+            if self._popularity[key] < 0.5:
+                del self._popularity[key]
+                del self._popular_locations[key]
+        if len(self._popularity) > POPULARITY_MAX_TRACKED:
+            keep = dict(self._popularity.most_common(POPULARITY_MAX_TRACKED))
+            for key in list(self._popularity):
+                if key not in keep:
+                    del self._popularity[key]
+                    del self._popular_locations[key]
+        
+    def _prune_cache(self):
+        now = time.time()
+        for key in [k for k, (expires, _) in self._cache.items() if expires <= now]:
+            del self._cache[key]
+    
+    async def _coalesce(self, key: tuple, func: Callable, *args, process: bool = False) -> Any:
+        """Exécute la fonction bloquante dans un thread (ou dans le pool de processus), en partageant le résultat entre les appels simultanés identiques"""
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(run_in_process(func, *args) if process else asyncio.to_thread(func, *args))
+            self._inflight[key] = future
+            future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(future)
+    
+    async def _cached_fetch(self, kind: str, loc: dict, fetcher: Callable[[dict], Optional[dict]], ttl: int, *, force: bool = False) -> Optional[dict]:
+        key = (kind, self._location_key(loc))
+        if not force:
+            entry = self._cache.get(key)
+            if entry and entry[0] > time.time():
+                return entry[1]
+        data = await self._coalesce(key, fetcher, loc)
+        if data:
+            self._cache[key] = (time.time() + ttl, data)
+        return data
+    
+    def _split_city_country(self, city: str, country: str = '') -> Tuple[str, str]:
+        """Sépare le pays d'une valeur d'autocomplétion au format 'Ville, CC'"""
+        if not country and ',' in city:
+            name, _, code = city.rpartition(',')
+            if len(code.strip()) == 2:
+                return name.strip(), code.strip()
+        return city, country
+    
+    async def fetch_geocode(self, city: str, country: str = '') -> Optional[dict]:
+        """Version asynchrone et mise en cache de get_geocode(), résolue localement si la ville est dans l'index"""
+        city, country = self._split_city_country(city, country)
+        key = (city.strip().lower(), country.strip().lower())
+        if key in self._geocode_cache:
+            self._geocode_cache.move_to_end(key)
+            return self._geocode_cache[key]
+        local = self.gazetteer.resolve(city, country)
+        if local:
+            return local
+        loc = await self._coalesce(('geocode', key), self.get_geocode, city, country)
+        if loc:
+            self._geocode_cache[key] = loc
+            if len(self._geocode_cache) > GEOCODE_CACHE_SIZE:
+                self._geocode_cache.popitem(last=False)
+        return loc
+    
+    async def fetch_week_chart(self, loc: dict, forecast: dict) -> bytes:
+        """Renvoie le graphique PNG des prévisions, rendu hors de la boucle d'événements et mis en cache par lieu et récupération"""
+        key = ('chart', self._location_key(loc), forecast['fetched'])
+        if key in self._chart_cache:
+            self._chart_cache.move_to_end(key)
+            return self._chart_cache[key]
+        items = forecast['list']
+        day_marks = [(i, item['day'][:5]) for i, item in enumerate(items) if i == 0 or item['day'] != items[i - 1]['day']]
+        png = await self._coalesce(key, render_week_chart, [i['temp'] for i in items], [i['precipitation'] for i in items], day_marks, CHART_FONT, process=True)
+        self._chart_cache[key] = png
+        if len(self._chart_cache) > CHART_CACHE_SIZE:
+            self._chart_cache.popitem(last=False)
+        return png
+    
+    async def fetch_current_weather(self, loc: dict) -> Optional[dict]:
+        """Version asynchrone et mise en cache de get_current_weather()"""
+        self._track_query(loc)
+        return await self._cached_fetch('current', loc, self.get_current_weather, CACHE_TTL_CURRENT)
+    
+    async def fetch_week_weather(self, loc: dict) -> Optional[dict]:
+        """Version asynchrone et mise en cache de get_week_weather()"""
+        self._track_query(loc)
+        return await self._cached_fetch('week', loc, self.get_week_weather, CACHE_TTL_WEEK)
+        
     def __weather_icon(self, icon_id: str):
         return f"https://openweathermap.org/img/wn/{icon_id}@2x.png"
         
     def get_current_weather(self, city: dict) -> Optional[dict]:
         api_key = self.get_setting('OWMAPIKey')
-        url = f"https://api.openweathermap.org/data/2.5/weather?lat={city['lat']}&lon={city['lon']}&appid={api_key}&units=metric&lang=fr"
+        url = f"{self.api_url}/data/2.5/weather?lat={city['lat']}&lon={city['lon']}&appid={api_key}&units=metric&lang=fr"
         response = requests.get(url)
         if response.status_code == 200:
             data = response.json()
@@ -125,20 +436,24 @@ class Forecast(commands.GroupCog, group_name='weather', description='Commandes d
     def get_week_weather(self, city: dict) -> Optional[dict]:
         """Afficher les prévisions pour la semaine"""
         api_key = self.get_setting('OWMAPIKey')
-        url = f"https://api.openweathermap.org/data/2.5/forecast?lat={city['lat']}&lon={city['lon']}&appid={api_key}&units=metric&lang=fr"
+        url = f"{self.api_url}/data/2.5/forecast?lat={city['lat']}&lon={city['lon']}&appid={api_key}&units=metric&lang=fr"
         response = requests.get(url)
         if response.status_code == 200:
             data = response.json()
             return {'name': data['city']['name'],
                     'country': data['city']['country'],
-                    'list': [{'date': datetime.fromtimestamp(item['dt']),
+                    'list': [{'date': (date := datetime.fromtimestamp(item['dt'])),
+                              'day': date.strftime('%d/%m/%Y'),
+                              'hour': date.strftime('%H'),
                               'temp': item['main']['temp'],
                               'temp_min': item['main']['temp_min'],
                               'temp_max': item['main']['temp_max'],
                               'humidity': item['main']['humidity'],
                               'weather': item['weather'][0]['description'],
+                              'precipitation': item.get('rain', {}).get('3h', 0) + item.get('snow', {}).get('3h', 0),
                               'weather_icon': self.__weather_icon(item['weather'][0]['icon'])} for item in data['list']],
-                    'updated': datetime.fromtimestamp(data['list'][0]['dt'])}
+                    'updated': datetime.fromtimestamp(data['list'][0]['dt']),
+                    'fetched': time.time()}
         else:
             return None
         
@@ -161,13 +476,10 @@ class Forecast(commands.GroupCog, group_name='weather', description='Commandes d
         :param city: Ville concernée
         :param country: Préciser le pays (si nécessaire)
         """
-        if country:
-            loc = self.get_geocode(city, country)
-        else:
-            loc = self.get_geocode(city)
+        loc = await self.fetch_geocode(city, country or '')
         
         if loc:
-            forecast = self.get_current_weather(loc)
+            forecast = await self.fetch_current_weather(loc)
             if forecast:
                 embed = discord.Embed(title=f"**Météo actuelle** · `{forecast['name']}, {self.get_iso_country_by_alpha2(forecast['country']).name}`", 
                                       color=self.determine_embed_color(forecast['temp']),
@@ -203,36 +515,50 @@ class Forecast(commands.GroupCog, group_name='weather', description='Commandes d
         :param city: Ville concernée
         :param country: Préciser le pays (si nécessaire)
         """
-        if country:
-            loc = self.get_geocode(city, country)
-        else:
-            loc = self.get_geocode(city)
+        loc = await self.fetch_geocode(city, country or '')
         
         if loc:
-            forecast = self.get_week_weather(loc)
+            forecast = await self.fetch_week_weather(loc)
             if forecast:
                 embed = discord.Embed(title=f"**Prévisions météo J-5** · `{forecast['name']}, {self.get_iso_country_by_alpha2(forecast['country']).name}`",
-                                      description="Prévisions météo pour les 5 prochains jours, toutes les 3 heures.\nLecture · `Heure Météo · Température (Min / Max) · Humidité`",
+                                      description="Prévisions météo pour les 5 prochains jours.\nLecture · `Météo dominante · Min / Max · Précipitations`\nGraphique · `Température (ligne) · Précipitations (barres)`",
                                       color=self.determine_embed_color(forecast['list'][0]['temp']),
                                       timestamp=forecast['updated'].astimezone(tz=None))
                 days = {}
                 for item in forecast['list']:
-                    if item['date'].strftime('%d/%m/%Y') not in days:
-                        days[item['date'].strftime('%d/%m/%Y')] = []
-                    days[item['date'].strftime('%d/%m/%Y')].append(item)
+                    days.setdefault(item['day'], []).append(item)
                 
-                for day in days:
-                    day_txt = [f"__{item['date'].strftime('%H')}h__ **{item['weather'].capitalize()}** · {item['temp']}°C ({item['temp_min']}°C / {item['temp_max']}°C) · {item['humidity']}%" for item in days[day]]
+                for day, items in days.items():
+                    weather = Counter(item['weather'] for item in items).most_common(1)[0][0]
+                    precipitation = sum(item['precipitation'] for item in items)
                     embed.add_field(name=f"• {day}",
-                                    value="\n".join(day_txt),
+                                    value=f"**{weather.capitalize()}** · {min(i['temp_min'] for i in items)}°C / {max(i['temp_max'] for i in items)}°C · {round(precipitation, 1)} mm",
                                     inline=False)
                 embed.set_footer(text="Données de OpenWeatherMap · Prochaine mise à jour", icon_url="https://openweathermap.org/themes/openweathermap/assets/img/mobile_app/android-app-top-banner.png") 
-                await interaction.response.send_message(embed=embed)
+                try:
+                    chart = await self.fetch_week_chart(loc, forecast)
+                except Exception as e:
+                    logger.error(f"Erreur lors du rendu du graphique des prévisions : {e}", exc_info=True)
+                    return await interaction.response.send_message(embed=embed)
+                embed.set_image(url="attachment://forecast.png")
+                await interaction.response.send_message(embed=embed, file=discord.File(io.BytesIO(chart), filename='forecast.png'))
             else:
                 await interaction.response.send_message("**Erreur ·** Impossible de récupérer la prévision météo pour cette ville.")
         else:
             await interaction.response.send_message("**Erreur ·** Cette ville n'est pas dans les données d'OpenWeatherMap.\nVérifiez l'orthographe, fournissez le pays ou essayez la grosse ville la plus proche.")
         
+    @forecast_current.autocomplete('city')
+    @forecast_week.autocomplete('city')
+    async def forecast_city_autocomplete(self, interaction: discord.Interaction, current: str) -> List[app_commands.Choice]:
+        country = getattr(interaction.namespace, 'country', '') or ''
+        choices = []
+        for idx in self.gazetteer.search(current, country, limit=10):
+            loc = self.gazetteer.to_location(idx)
+            iso = iso3166.countries.get(loc['country'], None)
+            label = f"{loc['name']} · {iso.name if iso else loc['country']} ({pretty.humanize_number(self.gazetteer.populations[idx])} hab.)"
+            choices.append(app_commands.Choice(name=label[:100], value=f"{loc['name']}, {loc['country']}"[:100]))
+        return choices
+        
     @forecast_week.autocomplete('country')
     async def forecast_today_autocomplete(self, interaction: discord.Interaction, current: str) -> List[app_commands.Choice]:
         all_codes = self.get_all_iso_countries()
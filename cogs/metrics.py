@@ -0,0 +1,57 @@
+import logging
+from typing import Optional
+
+from aiohttp import web
+from discord.ext import commands
+from tabulate import tabulate
+
+from common.metrics import registry as metrics
+from common.utils import pretty
+
+logger = logging.getLogger('ctrlshift.Metrics')
+
+
+class Metrics(commands.Cog):
+    """Mesures de performance des listeners et des commandes"""
+
+    def __init__(self, bot: commands.Bot):
+        self.bot = bot
+        self._runner : Optional[web.AppRunner] = None
+
+    async def cog_load(self):
+        port = self.bot.config.get('METRICS_PORT')
+        if not port:
+            return
+        app = web.Application()
+        app.router.add_get('/metrics', self.metrics_endpoint)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, '127.0.0.1', int(port)).start()
+        logger.info(f"Mesures exposées sur http://127.0.0.1:{port}/metrics")
+
+    async def cog_unload(self):
+        if self._runner:
+            await self._runner.cleanup()
+
+    async def metrics_endpoint(self, request: web.Request) -> web.Response:
+        return web.Response(text=metrics.render_prometheus(), content_type='text/plain', charset='utf-8')
+
+    @commands.command(name='metrics', hidden=True)
+    @commands.is_owner()
+    async def show_metrics(self, ctx: commands.Context, kind: Optional[str] = None):
+        """Affiche les latences, erreurs et exécutions en cours des listeners et commandes
+
+        :param kind: Filtrer par type ('listener', 'command', 'worker' ou 'worker_wait')
+        """
+        rows = metrics.summary(kind)
+        if not rows:
+            return await ctx.send("**Mesures ·** Aucune donnée pour le moment")
+        table = [[r['name'] if kind else f"{r['kind']} · {r['name']}", r['count'], r['errors'], r['in_flight'], f"{r['mean'] * 1000:.1f}", f"≤{r['p50'] * 1000:g}", f"≤{r['p95'] * 1000:g}"] for r in rows[:25]]
+        text = tabulate(table, headers=['Nom', 'Appels', 'Err.', 'En cours', 'Moy. (ms)', 'p50 (ms)', 'p95 (ms)'])
+        if metrics.gauges:
+            text += '\n\n' + '\n'.join(f"{name} = {value:g}" for name, value in sorted(metrics.gauges.items()))
+        await ctx.send(pretty.codeblock(pretty.troncate_text(text, 1900)))
+
+
+async def setup(bot):
+    await bot.add_cog(Metrics(bot))
@@ -1,9 +1,12 @@
 from datetime import datetime
+import asyncio
 import logging
 import random
+from functools import lru_cache
 from io import BytesIO
 from typing import Optional, Union, Tuple, List, Literal
 import colorgram
+import numpy as np
 import textwrap
 import re
 import aiohttp
@@ -11,10 +14,13 @@ import discord
 from discord import app_commands
 from discord.app_commands import Choice
 from discord.ext import commands
-from PIL import Image, ImageDraw, ImageFont
+from PIL import Image, ImageDraw
 from tinydb import Query
 
 from common.dataio import get_package_path, get_tinydb_database, get_sqlite_database
+from common.utils.fonts import get_font, preload_fonts
+from common.utils.textlayout import fit_text, probe_sizes
+from common.workers import register_initializer, run_in_process
 from common.utils import fuzzy
 
 logger = logging.getLogger('ctrlshift.Quotes')
@@ -22,7 +28,7 @@ logger = logging.getLogger('ctrlshift.Quotes')
 FONTS = [
     'Roboto-Regular.ttf',
     'BebasNeue-Regular.ttf',
-    'NotoBebasNeue.ttf'
+    'NotoBebasNeue.ttf',
     'Minecraftia-Regular.ttf',
     'coolvetica rg.otf',
     'OldLondon.ttf',
@@ -39,6 +45,99 @@ FONT_CHOICES = [
 QUOTIFY_LOGS_STARTDATE = '23/02/2023'
 EXTRACT_COLOR_LIMIT = 5
 
+QUOTE_V2_FONT = 'NotoBebasNeue.ttf'
+QUOTE_V1_SIZES = (12, 36) # Tailles de police min. et max. du texte des citations
+QUOTE_V2_SIZES = (12, 56)
+AUTHOR_FONT_SIZE = 26
+GRADIENT_CACHE_SIZE = 64 # Masques et calques de dégradé gardés en mémoire par processus de rendu
+# Polices utilisées par les rendus (chemin, taille, encodage), chargées au démarrage par les processus de rendu
+# Pour le texte, ce sont les premières tailles essayées par fit_text() : les autres dépendent de la citation
+RENDER_FONTS = [(get_package_path('quotes') + f"/{f}", size, '') for f in FONTS for size in probe_sizes(*QUOTE_V1_SIZES) + [AUTHOR_FONT_SIZE]] + \
+    [(get_package_path('quotes') + f"/{QUOTE_V2_FONT}", size, 'unic') for size in probe_sizes(*QUOTE_V2_SIZES) + [AUTHOR_FONT_SIZE]]
+
+# Rendu des images ------------------------------------------------------------
+# Exécuté dans le pool de processus partagé : entrées et sorties sérialisables (bytes, textes, tuples)
+
+def extract_image_colors(imgbin: bytes, n: int) -> List[Tuple[int, int, int]]:
+    """Extrait les couleurs dominantes d'une image
+
+    :param imgbin: Image source
+    :param n: Nombre de couleurs à extraire
+    :return: Liste de couleurs RGB
+    """
+    image = Image.open(BytesIO(imgbin))
+    return [tuple(c.rgb) for c in colorgram.extract(image, n)]
+
+def render_quote_v1(avatar: bytes, sentence: str, author_sentence: str, font_path: str) -> bytes:
+    """Dessine une citation v1 (texte centré sur l'avatar assombri) et renvoie le PNG"""
+    x1 = 512
+    y1 = 512
+    basebg = Image.new('RGBA', (x1, y1), (0, 0, 0, 0))
+    userbg = Image.open(BytesIO(avatar))
+    userbg = userbg.resize((x1, y1)).convert('RGBA')
+    background = Image.alpha_composite(basebg, userbg)
+    gradient = Image.new('RGBA', background.size, (0, 0, 0, 0))
+    gradient_draw = ImageDraw.Draw(gradient)
+    gradient_draw.polygon([(0, 0), (0, background.height), (background.width, background.height), (background.width, 0)], fill=(0, 0, 0, 125))
+    img = Image.alpha_composite(background, gradient)
+    d = ImageDraw.Draw(img)
+    
+    layout = fit_text(sentence.replace('-', '\n\n-'), font_path, x1 / 1.618, y1 - 60, max_size=QUOTE_V1_SIZES[1], min_size=QUOTE_V1_SIZES[0])
+    author_fontfile = get_font(font_path, AUTHOR_FONT_SIZE)
+
+    qy = (y1 - layout.height) / 2
+    d.multiline_text((x1 / 2, qy), layout.text, align="center", font=layout.font, fill=(255, 255, 255, 255), anchor='ma')
+    d.text((x1 / 2, qy + layout.height + 4), author_sentence, font=author_fontfile, fill=(255, 255, 255, 255), anchor='ma')
+    out = img.convert('RGB')
+    out = out.resize((512, 512))
+    with BytesIO() as buffer:
+        out.save(buffer, format='PNG')
+        return buffer.getvalue()
+
+@lru_cache(maxsize=GRADIENT_CACHE_SIZE)
+def _gradient_mask(size: Tuple[int, int], gradient_magnitude: float) -> Image.Image:
+    """Masque alpha du dégradé (transparent en haut, de plus en plus opaque vers le bas)"""
+    width, height = size
+    ramp = np.minimum(255, 255 * gradient_magnitude * np.arange(height) / width).astype(np.uint8)
+    return Image.fromarray(np.ascontiguousarray(np.broadcast_to(ramp[:, None], (height, width))), 'L')
+
+@lru_cache(maxsize=GRADIENT_CACHE_SIZE)
+def _gradient_layer(size: Tuple[int, int], gradient_magnitude: float, color: Tuple[int, int, int]) -> Image.Image:
+    """Calque de couleur unie portant le masque du dégradé (ne doit pas être modifié, il est partagé entre les rendus)"""
+    layer = Image.new('RGBA', size, color=color)
+    layer.putalpha(_gradient_mask(size, gradient_magnitude))
+    return layer
+
+def add_quote_gradient(image: Image.Image, gradient_magnitude=1.0, color: Tuple[int, int, int]=(0, 0, 0)) -> Image.Image:
+    im = image
+    if im.mode != 'RGBA':
+        im = im.convert('RGBA')
+    return Image.alpha_composite(im, _gradient_layer(im.size, round(gradient_magnitude, 2), tuple(color)))
+
+def render_quote_v2(avatar: bytes, text: str, author_text: str, gradient_color: Tuple[int, int, int], textcolor: Literal['white', 'black'], font_path: str) -> bytes:
+    """Dessine une citation v2 (dégradé coloré et texte ajusté en bas de l'avatar) et renvoie le PNG"""
+    if len(text) > 500:
+        raise ValueError("text must be less than 500 characters")
+    if len(author_text) > 32:
+        raise ValueError("author_text must be less than 32 characters")
+    
+    img = Image.open(BytesIO(avatar))
+    w, h = (512, 512)
+    bw, bh = (w - 20, h - 50)
+    img = img.convert("RGBA").resize((w, h)) 
+
+    gradient_magnitude = 0.85 + 0.05 * (len(text) / 100)
+    img = add_quote_gradient(img, gradient_magnitude, gradient_color)
+    layout = fit_text(text, font_path, bw, bh, max_size=QUOTE_V2_SIZES[1], min_size=QUOTE_V2_SIZES[0], encoding='unic', max_lines=8)
+    author_font = get_font(font_path, AUTHOR_FONT_SIZE, 'unic')
+    draw = ImageDraw.Draw(img)
+
+    draw.multiline_text((w/2, bh), layout.text, font=layout.font, align='center', fill=textcolor, anchor='md')
+    draw.text((w/2 - 7, h - 16), author_text, font=author_font, fill=textcolor, anchor='md')
+    with BytesIO() as buffer:
+        img.save(buffer, format='PNG')
+        return buffer.getvalue()
+
 class QuoteView(discord.ui.View):
     
     def __init__(self, cog: 'Quotes', quote_url: str, interaction: discord.Interaction):
@@ -209,9 +308,9 @@ class QuotifyEditor(discord.ui.View):
         
     async def start(self, interaction: discord.Interaction):
         await interaction.response.defer()
-        self.gradient_colors = self._cog._get_image_colors(BytesIO(await self.original_message.author.display_avatar.read()), EXTRACT_COLOR_LIMIT)
+        self.gradient_colors = await self._cog.get_image_colors(await self.original_message.author.display_avatar.read(), EXTRACT_COLOR_LIMIT)
         # Si la couleur de base du dégradé est trop claire, on inverse le texte en noir
-        color = self.gradient_colors[self.color_index].rgb
+        color = self.gradient_colors[self.color_index]
         if color[0] + color[1] + color[2] > 255 * 1.5:
             self.text_color = 'black'
         try:
@@ -391,6 +490,10 @@ class Quotes(commands.Cog):
         
         self.bookmark_emoji = self.bot.get_emoji(1077959551669776384)
         
+    async def cog_load(self):
+        # Chaque processus de rendu charge les polices à son démarrage
+        register_initializer('quotes.fonts', preload_fonts, RENDER_FONTS)
+        
     @commands.Cog.listener()
     async def on_ready(self):
         self.__initialize_database()
@@ -494,8 +597,6 @@ class Quotes(commands.Cog):
     # Quotify v1 (deprecated) -----------------------------------------
         
     async def quotify_message_img(self, message: discord.Message, fontname: str = None) -> discord.File:
-        x1 = 512
-        y1 = 512
         if not fontname:
             fontname = random.choice(FONTS)
         font = get_package_path('quotes') + f"/{fontname}"
@@ -504,130 +605,31 @@ class Quotes(commands.Cog):
             raise commands.BadArgument("Le message est trop long.")
         author_sentence = f"@{message.author.name}, {message.created_at.year}"
 
-        basebg = Image.new('RGBA', (x1, y1), (0, 0, 0, 0))
         userpfp = await message.author.display_avatar.read()
-        userbg = Image.open(BytesIO(userpfp))
-        userbg = userbg.resize((x1, y1)).convert('RGBA')
-        background = Image.alpha_composite(basebg, userbg)
-        gradient = Image.new('RGBA', background.size, (0, 0, 0, 0))
-        gradient_draw = ImageDraw.Draw(gradient)
-        gradient_draw.polygon([(0, 0), (0, background.height), (background.width, background.height), (background.width, 0)], fill=(0, 0, 0, 125))
-        img = Image.alpha_composite(background, gradient)
-        d = ImageDraw.Draw(img)
-        
-        fontfile = ImageFont.truetype(font, 36)
-        author_fontfile = ImageFont.truetype(font, 26)
-
-        sum = 0
-        for letter in sentence:
-            sum += d.textsize(letter, font=fontfile)[0]
-
-        average_length_of_letter = sum/len(sentence)
-
-        number_of_letters_for_each_line = (x1/1.618)/average_length_of_letter
-        incrementer = 0
-        fresh_sentence = ''
-
-        for letter in sentence:
-            if (letter == '-'):
-                fresh_sentence += '\n\n' + letter
-            elif (incrementer < number_of_letters_for_each_line):
-                fresh_sentence += letter
-            else:
-                if (letter == ' '):
-                    fresh_sentence += '\n'
-                    incrementer = 0
-                else:
-                    fresh_sentence += letter
-            incrementer += 1
-
-        dim = d.textsize(fresh_sentence, font=fontfile)
-        authdim = d.textsize(author_sentence, font=author_fontfile)
-        x2 = dim[0]
-        y2 = dim[1]
-        x3 = authdim[0]
-
-        qx = (x1/2 - x2/2)
-        qy = (y1/2-y2/2)
-
-        d.text((qx, qy), fresh_sentence, align="center", font=fontfile, fill=(255, 255, 255, 255))
-        d.text((x1 / 2 - (x3 / 2), qy + y2 + 4), author_sentence, align="center", font=author_fontfile, fill=(255, 255, 255, 255))
-        out = img.convert('RGB')
-        out = out.resize((512, 512))
-        with BytesIO() as buffer:
-            out.save(buffer, format='PNG')
-            buffer.seek(0)
-            return discord.File(buffer, filename=f'quote_{message.id}.png')
+        png = await run_in_process(render_quote_v1, userpfp, sentence, author_sentence, font)
+        return discord.File(BytesIO(png), filename=f'quote_{message.id}.png')
         
     # Quotify v2 ---------------------------------------------------------------
     
-    def _get_image_colors(self, imgbin: BytesIO, n: int) -> List[colorgram.Color]:
-        image = Image.open(imgbin)
-        return colorgram.extract(image, n)
-     
-    def _get_quote_img(self, background: Union[str, BytesIO], text: str, author_text: str, *, possible_colors: List[colorgram.Color], gradient_index: int, textcolor: Literal['white', 'black'], fontname: str = 'NotoBebasNeue.ttf') -> Image.Image:
-        if len(text) > 500:
-            raise ValueError("text must be less than 500 characters")
-        if len(author_text) > 32:
-            raise ValueError("author_text must be less than 32 characters")
-        if gradient_index > len(possible_colors):
-            raise ValueError("gradient_index must be less than the length of possible_colors")
-        
-        img = Image.open(background)
-        w, h = (512, 512)
-        bw, bh = (w - 20, h - 50)
-        img = img.convert("RGBA").resize((w, h)) 
-        fontfile = get_package_path('quotes') + f"/{fontname}"
-
-        gradient_color = possible_colors[gradient_index].rgb
-        gradient_magnitude = 0.85 + 0.05 * (len(text) / 100)
-        img = self._add_quote_gradient(img, gradient_magnitude, gradient_color)
-        font = ImageFont.truetype(fontfile, 56, encoding='unic')
-        author_font = ImageFont.truetype(fontfile, 26, encoding='unic')
-        draw = ImageDraw.Draw(img)
-            
-        wrapwidth = int(bw / font.getlength(' ') + (0.02 * len(text)))
-        wrap = textwrap.fill(text, width=wrapwidth, placeholder='…', replace_whitespace=False, max_lines=8)
-        box = draw.multiline_textbbox((0, 0), wrap, font=font, align='center')
-        while box[2] > bw or box[3] > bh:
-            font = ImageFont.truetype(fontfile, font.size - 1)
-            box = draw.multiline_textbbox((0, 0), wrap, font=font, align='center')
-
-        draw.multiline_text((w/2, bh), wrap, font=font, align='center', fill=textcolor, anchor='md')
-        draw.text((w/2 - 7, h - 16), author_text, font=author_font, fill=textcolor, anchor='md')
-        return img
-
-    def _add_quote_gradient(self, image: Image.Image, gradient_magnitude=1.0, color: Tuple[int, int, int]=(0, 0, 0)):
-        im = image
-        if im.mode != 'RGBA':
-            im = im.convert('RGBA')
-        width, height = im.size
-        gradient = Image.new('L', (1, height), color=0xFF)
-        for x in range(height):
-            gradient.putpixel((0, x), int(255 * (gradient_magnitude * float(x)/(width))))
-        
-        alpha = gradient.resize(im.size)
-        black_im = Image.new('RGBA', (width, height), color=color) # i.e. black
-        black_im.putalpha(alpha)
-        gradient_im = Image.alpha_composite(im, black_im)
-        return gradient_im
+    async def get_image_colors(self, imgbin: bytes, n: int) -> List[Tuple[int, int, int]]:
+        return await run_in_process(extract_image_colors, imgbin, n)
     
-    async def create_quote_img(self, messages: List[discord.Message], gradient_index: int, gradient_possible_colors: List[colorgram.Color], text_color: Literal['white', 'black']) -> discord.File:
+    async def create_quote_img(self, messages: List[discord.Message], gradient_index: int, gradient_possible_colors: List[Tuple[int, int, int]], text_color: Literal['white', 'black']) -> discord.File:
         """Crée une image de citation à partir d'un ou plusieurs message(s) (v2)"""
         messages = sorted(messages, key=lambda m: m.created_at)
-        user_avatar = BytesIO(await messages[0].author.display_avatar.read())
+        if gradient_index >= len(gradient_possible_colors):
+            raise ValueError("gradient_index must be less than the length of possible_colors")
+        user_avatar = await messages[0].author.display_avatar.read()
         message_year = messages[0].created_at.strftime('%Y')
         content = ' '.join(self.parse_emojis(m.clean_content) for m in messages)
+        fontfile = get_package_path('quotes') + f"/{QUOTE_V2_FONT}"
         try:
-            image = self._get_quote_img(user_avatar, f"“{content}”", f'— {messages[0].author.name}, {message_year}', possible_colors=gradient_possible_colors, gradient_index=gradient_index, textcolor=text_color)
+            png = await run_in_process(render_quote_v2, user_avatar, f"“{content}”", f'— {messages[0].author.name}, {message_year}', gradient_possible_colors[gradient_index], text_color, fontfile)
         except ValueError as e:
             logger.error(f"Une erreur est survenue lors de la création de l'image de citation: {e}", exc_info=True)
             raise ValueError(f"Une erreur est survenue lors de la création de l'image de citation: {e}")
-        with BytesIO() as buffer:
-            image.save(buffer, format='PNG')
-            buffer.seek(0)
-            desc = f"'{content}'\n— {messages[0].author.name}, {message_year}"
-            return discord.File(buffer, filename=f"quote_{'_'.join([str(m.id) for m in messages])}.png", description=desc)
+        desc = f"'{content}'\n— {messages[0].author.name}, {message_year}"
+        return discord.File(BytesIO(png), filename=f"quote_{'_'.join([str(m.id) for m in messages])}.png", description=desc)
         
     async def get_potential_quote_messages(self, channel: Union[discord.TextChannel, discord.Thread], message: discord.Message) -> List[discord.Message]:
         """Récupère les messages potentiels à partir du message donné"""
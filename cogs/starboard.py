@@ -1,16 +1,20 @@
 # pyright: reportGeneralTypeIssues=false
 
+import asyncio
+import heapq
 import json
 import logging
 import re
 import sqlite3
 import time
-from datetime import datetime
+from collections import OrderedDict
+from datetime import datetime, timedelta
 from copy import copy
-from typing import Any, Optional
+from typing import Any, Dict, Hashable, List, NamedTuple, Optional, Set, Tuple, Union
 
 import discord
 from discord import app_commands
+from discord.app_commands import Choice
 from discord.ext import commands, tasks
 from tabulate import tabulate
 
@@ -20,38 +24,272 @@ from common.utils import fuzzy, pretty
 logger = logging.getLogger('ctrlshift.Starboard')
 
 DEFAULT_SETTINGS = [
-    ('PostChannelID', 0),
-    ('PostTarget', 5),
     ('AdaptiveTargetRange', 2),
-    ('DetectPotentialPost', True)
+    ('DetectPotentialPost', False)
 ]
 
+SCHEMA_VERSION = 3
+DEFAULT_THRESHOLD = 5
+MESSAGE_LIFETIME = 86400 # Durée (en secondes) pendant laquelle un message peut recevoir des votes
+EXPIRY_CHECK_INTERVAL = 60
+EXPIRY_BATCH_SIZE = 200
+EDIT_DEBOUNCE_DELAY = 10 # Délai (en secondes) de regroupement des mises à jour d'un message du salon Starboard
+
+# Rattrapage des votes depuis l'historique des salons
+BACKFILL_RATE = 2.0 # Requêtes par seconde autorisées pour l'ensemble des rattrapages en cours
+BACKFILL_BURST = 5
+BACKFILL_CONCURRENCY = 3 # Salons parcourus simultanément
+BACKFILL_PROGRESS_INTERVAL = 10 # Délai (en secondes) entre deux mises à jour du message de progression
+
+# Détection des messages populaires (DetectPotentialPost)
+VELOCITY_MESSAGE_HALFLIFE = 600 # Demi-vie (en secondes) du rythme de votes d'un message
+VELOCITY_CHANNEL_HALFLIFE = 21600 # Demi-vie (en secondes) du rythme de votes habituel d'un salon
+VELOCITY_FACTOR = 2 # Un message se démarque si ses votes récents sont X fois plus nombreux que ceux d'un message voté typique du salon...
+VELOCITY_MIN_BURST = 2.5 # ...et au moins aussi nombreux que cela (pondérés par leur ancienneté)
+VELOCITY_MIN_MESSAGES = 10 # Historique minimal (messages votés récemment dans le salon) avant de juger un message
+VELOCITY_MAX_MESSAGES = 5000
+VELOCITY_MAX_CHANNELS = 1000
+
+
+# Points de code des emojis Unicode (pictogrammes et modificateurs), pour valider les emojis de vote
+EMOJI_PICTOGRAPHS = ((0x1F000, 0x1FAFF), (0x2600, 0x27BF), (0x2300, 0x23FF), (0x2B00, 0x2BFF), (0x2190, 0x21FF), (0x25A0, 0x25FF),
+                     (0x2934, 0x2935), (0x3030, 0x3030), (0x303D, 0x303D), (0x3297, 0x3299), (0x00A9, 0x00A9), (0x00AE, 0x00AE),
+                     (0x203C, 0x203C), (0x2049, 0x2049), (0x2122, 0x2122), (0x2139, 0x2139))
+EMOJI_MODIFIERS = ((0xFE0E, 0xFE0F), (0x1F3FB, 0x1F3FF), (0xE0020, 0xE007F))
+EMOJI_ZWJ, EMOJI_KEYCAP = '\u200d', '\u20e3'
+
+LEADERBOARD_PERIODS = [
+    Choice(name='Cette semaine', value='week'),
+    Choice(name='Ce mois-ci', value='month')
+]
+LEADERBOARD_KINDS = [
+    Choice(name='Auteurs', value='author'),
+    Choice(name='Messages', value='message'),
+    Choice(name='Salons', value='channel')
+]
+
+
+def leaderboard_buckets(date: datetime) -> List[Tuple[str, str]]:
+    """Renvoie les périodes de classement (semaine ISO et mois) d'une date
+
+    :param date: Date
+    :return: Liste de tuples (période, identifiant de la période)
+    """
+    year, week, _ = date.isocalendar()
+    return [('week', f'{year}-W{week:02d}'), ('month', date.strftime('%Y-%m'))]
+
+
+def emoji_key(emoji: Union[str, discord.Emoji, discord.PartialEmoji]) -> str:
+    """Renvoie la clé d'un emoji dans la table des salons Starboard (ID pour un emoji personnalisé, caractère sinon)
+    Le sélecteur de variante U+FE0F, ajouté par certains claviers mais absent de la plupart des réactions, est retiré"""
+    if isinstance(emoji, str):
+        return emoji.replace('\ufe0f', '')
+    return str(emoji.id) if emoji.id else emoji.name.replace('\ufe0f', '')
+
+
+def is_unicode_emoji(text: str) -> bool:
+    """Vérifie qu'un texte est un seul emoji Unicode (éventuellement composé : modificateurs, séquences ZWJ, drapeaux, touches)"""
+    def within(char: str, ranges: Tuple[Tuple[int, int], ...]) -> bool:
+        return any(low <= ord(char) <= high for low, high in ranges)
+    
+    if not text or len(text) > 16:
+        return False
+    if len(text) == 2 and all(0x1F1E6 <= ord(c) <= 0x1F1FF for c in text): # Drapeau (paire d'indicateurs régionaux)
+        return True
+    if text[0] in '0123456789#*': # Touche (ex. 1️⃣)
+        return text[1:] in (EMOJI_KEYCAP, '\ufe0f' + EMOJI_KEYCAP)
+    # Pictogrammes suivis de leurs modificateurs, reliés entre eux par des ZWJ
+    for part in text.split(EMOJI_ZWJ):
+        if not part or not within(part[0], EMOJI_PICTOGRAPHS) or 0x1F1E6 <= ord(part[0]) <= 0x1F1FF:
+            return False
+        if not all(within(c, EMOJI_MODIFIERS) for c in part[1:]):
+            return False
+    return True
+
+
+class Board(NamedTuple):
+    """Salon Starboard associé à un emoji"""
+    emoji: str
+    label: str
+    channel_id: int
+    threshold: int
+
 
 class StarboardError(Exception):
     """Erreurs spécifiques à Starboard"""
     
+    
+class RateBudget:
+    """Seau à jetons limitant le nombre de requêtes par seconde, partagé entre plusieurs tâches"""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        
+    async def acquire(self, tokens: int = 1):
+        """Attend que les jetons soient disponibles et les consomme
+
+        :param tokens: Nombre de requêtes à réserver (limité à la capacité du seau)
+        """
+        tokens = min(tokens, self.capacity)
+        while True:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return
+            await asyncio.sleep((tokens - self._tokens) / self.rate)
+            
+
+class VelocityDetector:
+    """Suivi en mémoire bornée du rythme des votes par message et par salon (moyennes à décroissance exponentielle)
+
+    Chaque vote est traité en temps constant, sans requête sur l'historique. La référence est le nombre moyen de votes
+    que reçoit un message voté du salon (hors message jugé) : un message se démarque s'il en reçoit bien plus en quelques minutes.
+    Tant que le salon n'a pas assez d'historique (notamment après un redémarrage), aucun message n'est signalé.
+    """
+
+    def __init__(self, max_messages: int = VELOCITY_MAX_MESSAGES, max_channels: int = VELOCITY_MAX_CHANNELS):
+        self.max_messages = max_messages
+        self.max_channels = max_channels
+        # message -> (votes récents, votes comptés dans le salon, date du premier vote, dernière mise à jour)
+        self._messages : OrderedDict[Hashable, Tuple[float, float, float, float]] = OrderedDict()
+        # salon -> (votes, messages votés, dernière mise à jour)
+        self._channels : OrderedDict[Hashable, Tuple[float, float, float]] = OrderedDict()
+        
+    @staticmethod
+    def _decay(value: float, since: float, halflife: float, now: float) -> float:
+        return value * 2 ** (-(now - since) / halflife)
+    
+    @staticmethod
+    def _store(store: OrderedDict, key: Hashable, value: tuple, max_size: int):
+        store[key] = value
+        store.move_to_end(key)
+        if len(store) > max_size:
+            store.popitem(last=False)
+    
+    def observe(self, channel_key: Hashable, message_key: Hashable, now: Optional[float] = None) -> bool:
+        """Enregistre un vote et indique si le message se démarque par la rapidité de ses votes
+
+        :param channel_key: Identifiant du salon (ex. ID du salon et emoji du vote)
+        :param message_key: Identifiant du message
+        :param now: Date du vote, par défaut maintenant
+        :return: True si les votes récents du message dépassent nettement ceux d'un message voté typique du salon
+        """
+        now = now or time.time()
+        message = self._messages.get(message_key)
+        if message:
+            burst, own_votes, first_vote, updated = message
+            burst = self._decay(burst, updated, VELOCITY_MESSAGE_HALFLIFE, now)
+            own_votes = self._decay(own_votes, updated, VELOCITY_CHANNEL_HALFLIFE, now)
+            own_messages = self._decay(1, first_vote, VELOCITY_CHANNEL_HALFLIFE, now)
+        else:
+            burst, own_votes, first_vote, own_messages = 0.0, 0.0, now, 0.0
+        votes, messages, updated = self._channels.get(channel_key, (0.0, 0.0, now))
+        votes = self._decay(votes, updated, VELOCITY_CHANNEL_HALFLIFE, now)
+        messages = self._decay(messages, updated, VELOCITY_CHANNEL_HALFLIFE, now)
+        
+        burst += 1
+        # Référence : les autres messages votés du salon, sans le message jugé
+        other_votes, other_messages = votes - own_votes, messages - own_messages
+        stands_out = False
+        if other_messages >= VELOCITY_MIN_MESSAGES:
+            typical = other_votes / other_messages
+            stands_out = burst >= VELOCITY_MIN_BURST and burst >= VELOCITY_FACTOR * typical
+        
+        self._store(self._channels, channel_key, (votes + 1, messages + (0 if message else 1), now), self.max_channels)
+        self._store(self._messages, message_key, (burst, own_votes + 1, first_vote, now), self.max_messages)
+        return stands_out
+    
+    def forget(self, message_key: Hashable):
+        self._messages.pop(message_key, None)
+    
 
 class Starboard(commands.GroupCog, group_name="star", description="Gestion et maintenance d'un salon de messages favoris"):
     """Gestion et maintenance d'un salon de messages favoris"""
 
     def __init__(self, bot: commands.Bot):
         self.bot = bot
+        self._boards : Dict[int, Dict[str, Board]] = {} # guild_id -> emoji -> salon Starboard
+        self._pending_edits : Dict[Tuple[int, str], Tuple[int, int]] = {}
+        self._edit_tasks : Dict[Tuple[int, str], asyncio.Task] = {}
+        self._posting : Set[Tuple[int, str]] = set() # (message_id, emoji) en cours de publication
+        self._expiry : List[Tuple[float, int, int, str]] = [] # (expiration, guild_id, message_id, emoji)
+        self._expiry_loaded : Set[int] = set()
+        self._leaderboard_pruned : Dict[int, List[Tuple[str, str]]] = {} # guild_id -> plus anciennes périodes conservées
+        self.velocity = VelocityDetector()
+        self.history_budget = RateBudget(BACKFILL_RATE, BACKFILL_BURST)
+        self._backfills : Set[int] = set()
         self.task_message_expire.start()
+        
+    async def cog_load(self):
+        if self.bot.is_ready():
+            self._initialize_database()
 
-    def cog_unload(self):
+    async def cog_unload(self):
         self.task_message_expire.cancel()
+        for task in self._edit_tasks.values():
+            task.cancel()
+        self._edit_tasks.clear()
+        pending = list(self._pending_edits.items())
+        self._pending_edits.clear()
+        await asyncio.gather(*[self._flush_edit(guild_id, channel_id, message_id, emoji) for (message_id, emoji), (guild_id, channel_id) in pending], return_exceptions=True)
         
-    @tasks.loop(hours=12)
+    @tasks.loop(seconds=EXPIRY_CHECK_INTERVAL)
     async def task_message_expire(self):
-        expiration = datetime.utcnow().timestamp() - 86400
-        for guild in self.bot.guilds:
-            conn = get_sqlite_database('starboard', 'g' + str(guild.id))
-            cursor = conn.cursor()
-            cursor.execute("DELETE FROM messages WHERE created_at < ?", (expiration,))
+        """Supprime par lots les messages arrivés à expiration, dans l'ordre de leurs échéances"""
+        now = time.time()
+        due : Dict[int, List[Tuple[int, str]]] = {}
+        while self._expiry and self._expiry[0][0] <= now:
+            _, guild_id, message_id, emoji = heapq.heappop(self._expiry)
+            due.setdefault(guild_id, []).append((message_id, emoji))
+        for guild_id, messages in due.items():
+            self.delete_expired_messages(guild_id, messages, now - MESSAGE_LIFETIME)
+        if due:
+            logger.debug(f"Suppression de {sum(len(m) for m in due.values())} message(s) expiré(s) Starboard")
+        
+        # Les périodes de classement révolues ne sont plus affichées ni modifiées (plus aucun de leurs messages n'est votable)
+        keep = leaderboard_buckets(discord.utils.utcnow() - timedelta(seconds=MESSAGE_LIFETIME))
+        for guild_id in list(self._boards):
+            if self._leaderboard_pruned.get(guild_id) != keep:
+                self.prune_leaderboard(guild_id, keep)
+                self._leaderboard_pruned[guild_id] = keep
+            
+    def schedule_expiry(self, guild_id: int, message_id: int, emoji: str, created_at: float):
+        heapq.heappush(self._expiry, (created_at + MESSAGE_LIFETIME, guild_id, message_id, emoji))
+        
+    def delete_expired_messages(self, guild_id: int, messages: List[Tuple[int, str]], expiration: float):
+        """Supprime des messages expirés et leurs votes
+
+        :param guild_id: ID du serveur
+        :param messages: Messages arrivés à échéance (ID du message, emoji)
+        :param expiration: Date limite, les messages enregistrés après ne sont pas supprimés
+        """
+        conn = get_sqlite_database('starboard', 'g' + str(guild_id))
+        cursor = conn.cursor()
+        for i in range(0, len(messages), EXPIRY_BATCH_SIZE):
+            batch = [(message_id, emoji, expiration) for message_id, emoji in messages[i:i + EXPIRY_BATCH_SIZE]]
+            cursor.executemany("DELETE FROM votes WHERE message_id=?1 AND emoji=?2 AND EXISTS (SELECT 1 FROM messages WHERE message_id=?1 AND emoji=?2 AND created_at <= ?3)", batch)
+            cursor.executemany("DELETE FROM messages WHERE message_id=? AND emoji=? AND created_at <= ?", batch)
             conn.commit()
-            cursor.close()
-            conn.close()
-        logger.info("Suppression des messages expirés Starboard effectuée")
+        cursor.close()
+        conn.close()
+        
+    def prune_leaderboard(self, guild_id: int, keep: List[Tuple[str, str]]):
+        """Supprime les compteurs des périodes de classement antérieures à celles données
+
+        :param guild_id: ID du serveur
+        :param keep: Plus anciennes périodes à conserver, sous forme de tuples (période, identifiant de la période)
+        """
+        conn = get_sqlite_database('starboard', 'g' + str(guild_id))
+        cursor = conn.cursor()
+        cursor.executemany("DELETE FROM leaderboard WHERE period=? AND bucket < ?", keep)
+        conn.commit()
+        cursor.close()
+        conn.close()
         
     @commands.Cog.listener()
     async def on_ready(self):
@@ -66,14 +304,86 @@ class Starboard(commands.GroupCog, group_name="star", description="Gestion et ma
         for g in initguilds:
             conn = get_sqlite_database('starboard', 'g' + str(g.id))
             cursor = conn.cursor()
-            cursor.execute("CREATE TABLE IF NOT EXISTS messages (message_id BIGINT PRIMARY KEY, votes TEXT, embed_message BIGINT, created_at REAL)")
             cursor.execute("CREATE TABLE IF NOT EXISTS settings (name TINYTEXT PRIMARY KEY, value TEXT)")
             for name, default_value in DEFAULT_SETTINGS:
                 cursor.execute("INSERT OR IGNORE INTO settings (name, value) VALUES (?, ?)", (name, json.dumps(default_value)))
+            cursor.execute("CREATE TABLE IF NOT EXISTS boards (emoji TEXT PRIMARY KEY, label TEXT, channel_id BIGINT, threshold INTEGER)")
+            cursor.execute("UPDATE OR REPLACE boards SET emoji = REPLACE(emoji, ?1, '') WHERE INSTR(emoji, ?1) > 0", ('\ufe0f',)) # Clés enregistrées avant la normalisation (cf. emoji_key)
+            cursor.execute("CREATE TABLE IF NOT EXISTS backfill (channel_id BIGINT PRIMARY KEY, last_message_id BIGINT)")
+            if cursor.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='messages'").fetchone():
+                self._migrate_database(cursor)
+            else:
+                cursor.execute("CREATE TABLE messages (message_id BIGINT, emoji TEXT, embed_message BIGINT, created_at REAL, author_id BIGINT, channel_id BIGINT, PRIMARY KEY (message_id, emoji))")
+                cursor.execute("CREATE TABLE votes (message_id BIGINT, emoji TEXT, user_id BIGINT, PRIMARY KEY (message_id, emoji, user_id)) WITHOUT ROWID")
+                cursor.execute("CREATE TABLE leaderboard (period TEXT, bucket TEXT, emoji TEXT, kind TEXT, target_id BIGINT, channel_id BIGINT, stars INTEGER, PRIMARY KEY (period, bucket, emoji, kind, target_id))")
+                cursor.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            cursor.execute("CREATE INDEX IF NOT EXISTS messages_created_at ON messages (created_at)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS leaderboard_rank ON leaderboard (period, bucket, emoji, kind, stars DESC)")
             conn.commit()
+            self._boards[g.id] = {row[0]: Board(*row) for row in cursor.execute("SELECT emoji, label, channel_id, threshold FROM boards").fetchall()}
+            if g.id not in self._expiry_loaded:
+                self._load_expiry(g, cursor)
+                conn.commit()
             cursor.close()
             conn.close()
             
+    def _load_expiry(self, guild: discord.Guild, cursor: sqlite3.Cursor):
+        """Supprime les messages expirés pendant l'arrêt du bot et planifie l'expiration des autres"""
+        expiration = time.time() - MESSAGE_LIFETIME
+        cursor.execute("DELETE FROM votes WHERE (message_id, emoji) IN (SELECT message_id, emoji FROM messages WHERE created_at < ?)", (expiration,))
+        cursor.execute("DELETE FROM messages WHERE created_at < ?", (expiration,))
+        for message_id, emoji, created_at in cursor.execute("SELECT message_id, emoji, created_at FROM messages WHERE created_at >= ?", (expiration,)).fetchall():
+            self.schedule_expiry(guild.id, message_id, emoji, created_at)
+        self._expiry_loaded.add(guild.id)
+            
+    def _migrate_database(self, cursor: sqlite3.Cursor):
+        """Met à jour le schéma d'une base existante (version stockée dans PRAGMA user_version)"""
+        version = cursor.execute("PRAGMA user_version").fetchone()[0]
+        if version < 1:
+            # v1 : les votes ne sont plus une liste JSON dans messages.votes mais une ligne par votant dans la table votes
+            cursor.execute("CREATE TABLE IF NOT EXISTS votes (message_id BIGINT, user_id BIGINT, PRIMARY KEY (message_id, user_id)) WITHOUT ROWID")
+            columns = [c[1] for c in cursor.execute("PRAGMA table_info(messages)").fetchall()]
+            if 'votes' in columns:
+                rows = cursor.execute("SELECT message_id, votes FROM messages WHERE votes IS NOT NULL").fetchall()
+                for message_id, votes in rows:
+                    try:
+                        users = json.loads(votes)
+                    except ValueError:
+                        continue
+                    cursor.executemany("INSERT OR IGNORE INTO votes (message_id, user_id) VALUES (?, ?)", [(message_id, u) for u in users])
+                cursor.execute("UPDATE messages SET votes=NULL")
+                logger.info(f"Migration Starboard : votes de {len(rows)} message(s) convertis")
+            cursor.execute("PRAGMA user_version = 1")
+        if version < 2:
+            # v2 : auteur et salon des messages, pour les classements
+            columns = [c[1] for c in cursor.execute("PRAGMA table_info(messages)").fetchall()]
+            for column in ('author_id', 'channel_id'):
+                if column not in columns:
+                    cursor.execute(f"ALTER TABLE messages ADD COLUMN {column} BIGINT")
+            cursor.execute("CREATE TABLE IF NOT EXISTS leaderboard (period TEXT, bucket TEXT, kind TEXT, target_id BIGINT, channel_id BIGINT, stars INTEGER, PRIMARY KEY (period, bucket, kind, target_id))")
+            cursor.execute("PRAGMA user_version = 2")
+        if version < 3:
+            # v3 : plusieurs salons Starboard, un par emoji ; les données existantes sont rattachées à ⭐
+            cursor.execute("DROP INDEX IF EXISTS messages_created_at")
+            cursor.execute("DROP INDEX IF EXISTS leaderboard_rank")
+            cursor.execute("ALTER TABLE messages RENAME TO messages_v2")
+            cursor.execute("CREATE TABLE messages (message_id BIGINT, emoji TEXT, embed_message BIGINT, created_at REAL, author_id BIGINT, channel_id BIGINT, PRIMARY KEY (message_id, emoji))")
+            cursor.execute("INSERT INTO messages SELECT message_id, '⭐', embed_message, created_at, author_id, channel_id FROM messages_v2")
+            cursor.execute("DROP TABLE messages_v2")
+            cursor.execute("ALTER TABLE votes RENAME TO votes_v2")
+            cursor.execute("CREATE TABLE votes (message_id BIGINT, emoji TEXT, user_id BIGINT, PRIMARY KEY (message_id, emoji, user_id)) WITHOUT ROWID")
+            cursor.execute("INSERT INTO votes SELECT message_id, '⭐', user_id FROM votes_v2")
+            cursor.execute("DROP TABLE votes_v2")
+            cursor.execute("ALTER TABLE leaderboard RENAME TO leaderboard_v2")
+            cursor.execute("CREATE TABLE leaderboard (period TEXT, bucket TEXT, emoji TEXT, kind TEXT, target_id BIGINT, channel_id BIGINT, stars INTEGER, PRIMARY KEY (period, bucket, emoji, kind, target_id))")
+            cursor.execute("INSERT INTO leaderboard SELECT period, bucket, '⭐', kind, target_id, channel_id, stars FROM leaderboard_v2")
+            cursor.execute("DROP TABLE leaderboard_v2")
+
+            legacy = {name: json.loads(value) for name, value in cursor.execute("SELECT name, value FROM settings WHERE name IN ('PostChannelID', 'PostTarget')").fetchall()}
+            if int(legacy.get('PostChannelID') or 0):
+                cursor.execute("INSERT OR IGNORE INTO boards (emoji, label, channel_id, threshold) VALUES (?, ?, ?, ?)", ('⭐', '⭐', int(legacy['PostChannelID']), int(legacy.get('PostTarget', DEFAULT_THRESHOLD))))
+            cursor.execute("DELETE FROM settings WHERE name IN ('PostChannelID', 'PostTarget')")
+            cursor.execute("PRAGMA user_version = 3")
             
     def get_guild_settings(self, guild: discord.Guild) -> dict:
         """Obtenir les paramètres Starboard du serveur
@@ -105,30 +415,205 @@ class Starboard(commands.GroupCog, group_name="star", description="Gestion et ma
         cursor.close()
         conn.close()
         
+    def get_boards(self, guild: discord.Guild) -> Dict[str, Board]:
+        """Renvoie les salons Starboard du serveur, par emoji
         
-    def get_message_metadata(self, guild: discord.Guild, message: discord.Message) -> dict:
+        :param guild: Serveur
+        :return: dict
+        """
+        return self._boards.get(guild.id, {})
+
+    def set_board(self, guild: discord.Guild, board: Board):
+        """Crée ou remplace le salon Starboard associé à un emoji
+        Un nouvel emoji remet à zéro les points de reprise du rattrapage, pour que ses votes passés soient aussi rattrapés
+
+        :param guild: Serveur
+        :param board: Salon Starboard
+        """
+        conn = get_sqlite_database('starboard', 'g' + str(guild.id))
+        cursor = conn.cursor()
+        cursor.execute("INSERT OR REPLACE INTO boards (emoji, label, channel_id, threshold) VALUES (?, ?, ?, ?)", board)
+        if board.emoji not in self.get_boards(guild):
+            cursor.execute("DELETE FROM backfill")
+        conn.commit()
+        cursor.close()
+        conn.close()
+        self._boards.setdefault(guild.id, {})[board.emoji] = board
+
+    def remove_board(self, guild: discord.Guild, emoji: str) -> bool:
+        """Retire le salon Starboard associé à un emoji
+
+        :param guild: Serveur
+        :param emoji: Clé de l'emoji
+        :return: True si un salon a été retiré
+        """
         conn = get_sqlite_database('starboard', 'g' + str(guild.id))
         cursor = conn.cursor()
-        cursor.execute("SELECT * FROM messages WHERE message_id=?", (message.id,))
+        cursor.execute("DELETE FROM boards WHERE emoji=?", (emoji,))
+        removed = cursor.rowcount > 0
+        conn.commit()
+        cursor.close()
+        conn.close()
+        self._boards.get(guild.id, {}).pop(emoji, None)
+        return removed
+
+    def get_message_metadata(self, guild: discord.Guild, message: discord.Message, emoji: str) -> dict:
+        conn = get_sqlite_database('starboard', 'g' + str(guild.id))
+        cursor = conn.cursor()
+        cursor.execute("SELECT message_id, embed_message, created_at FROM messages WHERE message_id=? AND emoji=?", (message.id, emoji))
         data = cursor.fetchone()
+        if data:
+            cursor.execute("SELECT COUNT(*) FROM votes WHERE message_id=? AND emoji=?", (message.id, emoji))
+            votes = cursor.fetchone()[0]
         cursor.close()
         conn.close()
         if data:
-            return dict(message_id=data[0], votes=json.loads(data[1]), embed_message=data[2], created_at=data[3])
+            return dict(message_id=data[0], votes=votes, embed_message=data[1], created_at=data[2])
         return None
     
-    def delete_message_metadata(self, guild: discord.Guild, message: discord.Message) -> dict:
+    def delete_message_metadata(self, guild: discord.Guild, message: discord.Message, emoji: str) -> dict:
         conn = get_sqlite_database('starboard', 'g' + str(guild.id))
         cursor = conn.cursor()
-        cursor.execute("DELETE FROM messages WHERE message_id=?", (message.id,))
+        cursor.execute("DELETE FROM messages WHERE message_id=? AND emoji=?", (message.id, emoji))
+        cursor.execute("DELETE FROM votes WHERE message_id=? AND emoji=?", (message.id, emoji))
         conn.commit()
         cursor.close()
         conn.close()
         
+    def add_vote(self, guild: discord.Guild, message_id: int, emoji: str, user_id: int, created_at: float, author_id: Optional[int] = None, channel_id: Optional[int] = None) -> tuple[bool, int]:
+        """Enregistre le vote d'un membre sur un message (sans effet s'il a déjà voté)
+
+        :param guild: Serveur du message
+        :param message_id: ID du message
+        :param emoji: Clé de l'emoji du vote
+        :param user_id: ID du votant
+        :param created_at: Date d'enregistrement du message (si c'est son premier vote)
+        :param author_id: ID de l'auteur du message, pour les classements
+        :param channel_id: ID du salon du message, pour les classements
+        :return: Tuple (le vote est nouveau, nombre de votes du message)
+        """
+        conn = get_sqlite_database('starboard', 'g' + str(guild.id))
+        cursor = conn.cursor()
+        cursor.execute("INSERT OR IGNORE INTO messages (message_id, emoji, embed_message, created_at, author_id, channel_id) VALUES (?, ?, ?, ?, ?, ?)", (message_id, emoji, 0, created_at, author_id, channel_id))
+        if cursor.rowcount > 0:
+            self.schedule_expiry(guild.id, message_id, emoji, created_at)
+        cursor.execute("INSERT OR IGNORE INTO votes (message_id, emoji, user_id) VALUES (?, ?, ?)", (message_id, emoji, user_id))
+        added = cursor.rowcount > 0
+        if added:
+            self._update_leaderboard(cursor, message_id, emoji, 1)
+        cursor.execute("SELECT COUNT(*) FROM votes WHERE message_id=? AND emoji=?", (message_id, emoji))
+        count = cursor.fetchone()[0]
+        conn.commit()
+        cursor.close()
+        conn.close()
+        return added, count
     
-    async def get_embed(self, message: discord.Message) -> discord.Embed:
+    def remove_vote(self, guild: discord.Guild, message_id: int, emoji: str, user_id: int) -> tuple[bool, int]:
+        """Retire le vote d'un membre sur un message
+
+        :param guild: Serveur du message
+        :param message_id: ID du message
+        :param emoji: Clé de l'emoji du vote
+        :param user_id: ID du votant
+        :return: Tuple (un vote a été retiré, nombre de votes restants)
+        """
+        conn = get_sqlite_database('starboard', 'g' + str(guild.id))
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM votes WHERE message_id=? AND emoji=? AND user_id=?", (message_id, emoji, user_id))
+        removed = cursor.rowcount > 0
+        if removed:
+            self._update_leaderboard(cursor, message_id, emoji, -1)
+        cursor.execute("SELECT COUNT(*) FROM votes WHERE message_id=? AND emoji=?", (message_id, emoji))
+        count = cursor.fetchone()[0]
+        conn.commit()
+        cursor.close()
+        conn.close()
+        return removed, count
+        
+    
+    def add_votes(self, guild: discord.Guild, message_id: int, emoji: str, user_ids: List[int], created_at: float, author_id: Optional[int] = None, channel_id: Optional[int] = None) -> int:
+        """Enregistre en une fois les votes de plusieurs membres sur un message
+
+        :param guild: Serveur du message
+        :param message_id: ID du message
+        :param emoji: Clé de l'emoji des votes
+        :param user_ids: IDs des votants
+        :param created_at: Date d'enregistrement du message (si c'est son premier vote)
+        :param author_id: ID de l'auteur du message, pour les classements
+        :param channel_id: ID du salon du message, pour les classements
+        :return: Nombre de votes du message
+        """
+        conn = get_sqlite_database('starboard', 'g' + str(guild.id))
+        cursor = conn.cursor()
+        cursor.execute("INSERT OR IGNORE INTO messages (message_id, emoji, embed_message, created_at, author_id, channel_id) VALUES (?, ?, ?, ?, ?, ?)", (message_id, emoji, 0, created_at, author_id, channel_id))
+        if cursor.rowcount > 0:
+            self.schedule_expiry(guild.id, message_id, emoji, created_at)
+        cursor.executemany("INSERT OR IGNORE INTO votes (message_id, emoji, user_id) VALUES (?, ?, ?)", [(message_id, emoji, u) for u in user_ids])
+        if cursor.rowcount > 0:
+            self._update_leaderboard(cursor, message_id, emoji, cursor.rowcount)
+        cursor.execute("SELECT COUNT(*) FROM votes WHERE message_id=? AND emoji=?", (message_id, emoji))
+        count = cursor.fetchone()[0]
+        conn.commit()
+        cursor.close()
+        conn.close()
+        return count
+    
+    def _update_leaderboard(self, cursor: sqlite3.Cursor, message_id: int, emoji: str, delta: int):
+        """Reporte une variation de votes sur les compteurs des classements (auteur, salon et message, par semaine et par mois)
+        Les votes sont comptés dans les périodes de publication du message, de sorte qu'un retrait annule exactement l'ajout correspondant
+        """
+        cursor.execute("SELECT author_id, channel_id FROM messages WHERE message_id=? AND emoji=?", (message_id, emoji))
+        data = cursor.fetchone()
+        if not data:
+            return
+        author_id, channel_id = data
+        rows = []
+        for period, bucket in leaderboard_buckets(discord.utils.snowflake_time(message_id)):
+            for kind, target_id in (('author', author_id), ('channel', channel_id), ('message', message_id)):
+                if target_id:
+                    rows.append((period, bucket, emoji, kind, target_id, channel_id, delta))
+        cursor.executemany("""INSERT INTO leaderboard (period, bucket, emoji, kind, target_id, channel_id, stars) VALUES (?, ?, ?, ?, ?, ?, ?)
+                           ON CONFLICT (period, bucket, emoji, kind, target_id) DO UPDATE SET stars = stars + excluded.stars""", rows)
+        
+    def get_leaderboard(self, guild: discord.Guild, emoji: str, period: str, kind: str, limit: int = 10) -> List[Tuple[int, int, int]]:
+        """Renvoie le classement de la période en cours
+
+        :param guild: Serveur
+        :param emoji: Clé de l'emoji du salon Starboard
+        :param period: 'week' ou 'month'
+        :param kind: 'author', 'channel' ou 'message'
+        :param limit: Nombre de places
+        :return: Liste de tuples (ID, ID du salon, votes)
+        """
+        bucket = dict(leaderboard_buckets(discord.utils.utcnow()))[period]
+        conn = get_sqlite_database('starboard', 'g' + str(guild.id))
+        cursor = conn.cursor()
+        cursor.execute("SELECT target_id, channel_id, stars FROM leaderboard WHERE period=? AND bucket=? AND emoji=? AND kind=? AND stars > 0 ORDER BY stars DESC LIMIT ?", (period, bucket, emoji, kind, limit))
+        data = cursor.fetchall()
+        cursor.close()
+        conn.close()
+        return data
+    
+    def get_backfill_checkpoint(self, guild: discord.Guild, channel_id: int) -> int:
+        conn = get_sqlite_database('starboard', 'g' + str(guild.id))
+        cursor = conn.cursor()
+        cursor.execute("SELECT last_message_id FROM backfill WHERE channel_id=?", (channel_id,))
+        data = cursor.fetchone()
+        cursor.close()
+        conn.close()
+        return data[0] if data else 0
+    
+    def set_backfill_checkpoint(self, guild: discord.Guild, channel_id: int, message_id: int):
+        conn = get_sqlite_database('starboard', 'g' + str(guild.id))
+        cursor = conn.cursor()
+        cursor.execute("INSERT OR REPLACE INTO backfill (channel_id, last_message_id) VALUES (?, ?)", (channel_id, message_id))
+        conn.commit()
+        cursor.close()
+        conn.close()
+        
+    async def get_embed(self, message: discord.Message, board: Board) -> discord.Embed:
         guild = message.guild
-        metadata = self.get_message_metadata(guild, message)
+        metadata = self.get_message_metadata(guild, message, board.emoji)
         if not metadata:
             raise KeyError(f"Le message '{message.id}' n'a pas de données liées")
         
@@ -148,8 +633,8 @@ class Starboard(commands.GroupCog, group_name="star", description="Gestion et ma
         # message_content += f"\n[→ Aller au message]({message.jump_url})"
         
         content = reply_text + message_content
-        votes = len(metadata['votes'])
-        footxt = f"⭐ {votes}"
+        votes = metadata['votes']
+        footxt = f"{board.label} {votes}"
         
         em = discord.Embed(description=content, timestamp=message.created_at, color=0x2F3136)
         em.set_author(name=message.author.name, icon_url=message.author.display_avatar.url)
@@ -178,15 +663,14 @@ class Starboard(commands.GroupCog, group_name="star", description="Gestion et ma
             
         return em
             
-    async def post_starboard_message(self, message: discord.Message):
+    async def post_starboard_message(self, message: discord.Message, board: Board):
         guild = message.guild
-        settings = self.get_guild_settings(guild)
-        post_channel = self.bot.get_channel(int(settings['PostChannelID'])) if settings['PostChannelID'] else None
+        post_channel = self.bot.get_channel(board.channel_id)
         if not post_channel:
             raise ValueError("Channel Starboard non configuré")
 
         try:
-            embed = await self.get_embed(message)
+            embed = await self.get_embed(message, board)
         except KeyError as e:
             logger.error(e, exc_info=True)
             raise
@@ -202,72 +686,326 @@ class Starboard(commands.GroupCog, group_name="star", description="Gestion et ma
         
         conn = get_sqlite_database('starboard', 'g' + str(guild.id))
         cursor = conn.cursor()
-        cursor.execute("UPDATE messages SET embed_message=? WHERE message_id=?", (embed_msg.id, message.id))
+        cursor.execute("UPDATE messages SET embed_message=? WHERE message_id=? AND emoji=?", (embed_msg.id, message.id, board.emoji))
         conn.commit()
         cursor.close()
         conn.close()
     
-    async def edit_starboard_message(self, original_message: discord.Message):
+    async def edit_starboard_message(self, original_message: discord.Message, board: Board):
         guild = original_message.guild
-        settings = self.get_guild_settings(guild)
-        post_channel = self.bot.get_channel(int(settings['PostChannelID'])) if settings['PostChannelID'] else None
+        post_channel = self.bot.get_channel(board.channel_id)
         if not post_channel:
             raise ValueError("Channel Starboard non configuré")
     
-        metadata = self.get_message_metadata(guild, original_message)
+        metadata = self.get_message_metadata(guild, original_message, board.emoji)
+        if not metadata or not metadata['embed_message']: # Pas (encore) publié
+            return
         try:
             embed_msg = await post_channel.fetch_message(metadata['embed_message'])
         except:
             logger.info(f"Impossible d'accéder à {metadata['embed_message']} : données supprimées")
-            self.delete_message_metadata(guild, original_message)
+            self.delete_message_metadata(guild, original_message, board.emoji)
+            return
             
-        embed = await self.get_embed(original_message)
+        embed = await self.get_embed(original_message, board)
         await embed_msg.edit(embed=embed)
         
+    def schedule_edit(self, guild_id: int, channel_id: int, message_id: int, emoji: str):
+        """Programme la mise à jour du message Starboard lié à un message
+        Les votes reçus pendant le délai sont regroupés en une seule modification, qui affiche le décompte le plus récent
+
+        :param guild_id: ID du serveur
+        :param channel_id: ID du salon du message original
+        :param message_id: ID du message original
+        :param emoji: Clé de l'emoji du salon Starboard
+        """
+        key = (message_id, emoji)
+        self._pending_edits[key] = (guild_id, channel_id)
+        if key not in self._edit_tasks:
+            self._edit_tasks[key] = asyncio.create_task(self._delayed_edit(key))
+    
+    async def _delayed_edit(self, key: Tuple[int, str]):
+        await asyncio.sleep(EDIT_DEBOUNCE_DELAY)
+        self._edit_tasks.pop(key, None)
+        target = self._pending_edits.pop(key, None)
+        if target:
+            await self._flush_edit(target[0], target[1], *key)
+            
+    async def _flush_edit(self, guild_id: int, channel_id: int, message_id: int, emoji: str):
+        guild = self.bot.get_guild(guild_id)
+        channel = guild.get_channel_or_thread(channel_id) if guild else None
+        board = self._boards.get(guild_id, {}).get(emoji)
+        if not channel or not board:
+            return
+        try:
+            message = await channel.fetch_message(message_id)
+            await self.edit_starboard_message(message, board)
+        except Exception as e:
+            logger.error(f"Mise à jour Starboard impossible pour {message_id} : {e}", exc_info=True)
+        
     @commands.Cog.listener()
     async def on_raw_reaction_add(self, payload: discord.RawReactionActionEvent):
-        channel = self.bot.get_channel(payload.channel_id)
-        emoji = payload.emoji
-        if hasattr(channel, 'guild'):
-            guild = channel.guild
-            if emoji.name == '⭐':
-                settings = self.get_guild_settings(guild)
-                if settings['PostChannelID']:
-                    message = await channel.fetch_message(payload.message_id)
-                    if message.created_at.timestamp() + 86400 >= datetime.utcnow().timestamp():
-                        user = guild.get_member(payload.user_id)
-                        post_channel = guild.get_channel(int(settings['PostChannelID']))
-                        metadata = self.get_message_metadata(guild, message)
-                        if not metadata:
-                            created_at = datetime.utcnow().timestamp()
-                            metadata = {'message_id': message.id, 'votes': [], 'embed_message': 0, 'created_at': created_at}
-                            conn = get_sqlite_database('starboard', 'g' + str(guild.id))
-                            cursor = conn.cursor()
-                            cursor.execute("INSERT OR IGNORE INTO messages (message_id, votes, embed_message, created_at) VALUES (?, ?, ?, ?)", (message.id, '[]', 0, created_at))
-                            conn.commit()
-                            cursor.close()
-                            conn.close()
+        # Une seule recherche dans la table des salons Starboard du serveur écarte les réactions sans rapport
+        board = self._boards.get(payload.guild_id, {}).get(emoji_key(payload.emoji))
+        if not board:
+            return
+        guild = self.bot.get_guild(payload.guild_id)
+        if not guild:
+            return
+        # L'âge du message se déduit de son ID : pas besoin de le récupérer tant que le seuil n'est pas atteint
+        if discord.utils.snowflake_time(payload.message_id).timestamp() + MESSAGE_LIFETIME < time.time():
+            return
+        added, votes = self.add_vote(guild, payload.message_id, board.emoji, payload.user_id, time.time(), payload.message_author_id, payload.channel_id)
+        if not added:
+            return
+        target = board.threshold
+        settings = self.get_guild_settings(guild)
+        if str(settings['DetectPotentialPost']).lower() in ('1', 'true'):
+            # Un message qui reçoit des votes bien plus vite que d'habitude dans son salon peut être publié plus tôt
+            if self.velocity.observe((payload.channel_id, board.emoji), (payload.message_id, board.emoji)):
+                target = max(2, target - int(settings['AdaptiveTargetRange']))
+        if votes < target:
+            return
+        
+        metadata = self.get_message_metadata(guild, discord.Object(payload.message_id), board.emoji)
+        key = (payload.message_id, board.emoji)
+        # Les votes reçus pendant la publication ne font que programmer une mise à jour, pour ne publier qu'une fois
+        if metadata['embed_message'] or key in self._posting:
+            return self.schedule_edit(guild.id, payload.channel_id, payload.message_id, board.emoji)
+        
+        channel = guild.get_channel_or_thread(payload.channel_id)
+        if not channel:
+            return
+        self._posting.add(key)
+        try:
+            message = await channel.fetch_message(payload.message_id)
+            post_channel = guild.get_channel(board.channel_id)
+            if votes < board.threshold:
+                logger.info(f"Message {message.id} publié en avance ({votes} votes) : votes bien plus rapides que d'habitude dans #{channel}")
+            self.velocity.forget((message.id, board.emoji))
+            await self.post_starboard_message(message, board)
+        finally:
+            self._posting.discard(key)
+        try:
+            notif = await message.reply(f"Ce message a été enregistré sur {post_channel.mention} !", mention_author=False)
+            await notif.delete(delay=120)
+        except:
+            raise
+                                
+    @commands.Cog.listener()
+    async def on_raw_reaction_remove(self, payload: discord.RawReactionActionEvent):
+        board = self._boards.get(payload.guild_id, {}).get(emoji_key(payload.emoji))
+        if not board:
+            return
+        guild = self.bot.get_guild(payload.guild_id)
+        if not guild:
+            return
+        removed, _ = self.remove_vote(guild, payload.message_id, board.emoji, payload.user_id)
+        if removed:
+            metadata = self.get_message_metadata(guild, discord.Object(payload.message_id), board.emoji)
+            if metadata and metadata['embed_message']:
+                self.schedule_edit(guild.id, payload.channel_id, payload.message_id, board.emoji)
                         
-                        if user.id not in metadata['votes']:
-                            metadata['votes'].append(user.id)
-                            conn = get_sqlite_database('starboard', 'g' + str(guild.id))
-                            cursor = conn.cursor()
-                            cursor.execute("UPDATE messages SET votes=? WHERE message_id=?", (json.dumps(metadata['votes']), message.id))
-                            conn.commit()
-                            cursor.close()
-                            conn.close()
-                            
-                            if len(metadata['votes']) >= int(settings['PostTarget']):
-                                if not metadata['embed_message']:
-                                    await self.post_starboard_message(message)
-                                    try:
-                                        notif = await message.reply(f"Ce message a été enregistré sur {post_channel.mention} !", mention_author=False)
-                                        await notif.delete(delay=120)
-                                    except:
-                                        raise
-                                else:
-                                    await self.edit_starboard_message(message)
+        
+    async def backfill_channel(self, channel: discord.TextChannel, boards: Dict[str, Board], progress: dict):
+        """Rattrape les votes des messages encore votables d'un salon, à partir du dernier point de reprise
+
+        :param channel: Salon à parcourir
+        :param boards: Salons Starboard du serveur, par emoji
+        :param progress: Compteurs de progression partagés, mis à jour au fil du parcours
+        """
+        guild = channel.guild
+        oldest = discord.utils.time_snowflake(discord.utils.utcnow() - timedelta(seconds=MESSAGE_LIFETIME))
+        after = max(self.get_backfill_checkpoint(guild, channel.id), oldest)
+        
+        scanned = 0
+        await self.history_budget.acquire()
+        async for message in channel.history(limit=None, after=discord.Object(after), oldest_first=True):
+            scanned += 1
+            progress['messages'] += 1
+            for reaction in message.reactions:
+                board = boards.get(emoji_key(reaction.emoji))
+                if not board:
+                    continue
+                metadata = self.get_message_metadata(guild, message, board.emoji)
+                if metadata and metadata['votes'] >= reaction.count:
+                    continue
+                user_ids = []
+                async for user in reaction.users(limit=None):
+                    if len(user_ids) % 100 == 0:
+                        await self.history_budget.acquire()
+                    user_ids.append(user.id)
+                votes = self.add_votes(guild, message.id, board.emoji, user_ids, message.created_at.timestamp(), message.author.id, channel.id)
+                progress['votes'] += votes - (metadata['votes'] if metadata else 0)
+            
+                if votes >= board.threshold:
+                    metadata = self.get_message_metadata(guild, message, board.emoji)
+                    key = (message.id, board.emoji)
+                    if metadata['embed_message'] or key in self._posting:
+                        # Mise à jour : récupération des deux messages et modification
+                        await self.history_budget.acquire(3 + bool(message.reference))
+                        self.schedule_edit(guild.id, channel.id, message.id, board.emoji)
+                    else:
+                        # Publication : envoi, et récupération du message auquel il répond
+                        await self.history_budget.acquire(1 + bool(message.reference))
+                        self._posting.add(key)
+                        try:
+                            await self.post_starboard_message(message, board)
+                        finally:
+                            self._posting.discard(key)
+                        progress['posted'] += 1
                         
+            if scanned % 100 == 0: # Message entièrement traité : on peut reprendre après lui. Chaque page de 100 messages coûte une requête
+                self.set_backfill_checkpoint(guild, channel.id, message.id)
+                await self.history_budget.acquire()
+        if scanned:
+            self.set_backfill_checkpoint(guild, channel.id, message.id)
+        progress['channels'] += 1
+        
+    @app_commands.command(name="backfill")
+    @app_commands.guild_only
+    @app_commands.checks.has_permissions(manage_guild=True)
+    async def backfill_starboard(self, interaction: discord.Interaction, channel: Optional[discord.TextChannel] = None):
+        """Rattraper les votes donnés pendant une absence du bot, à partir de l'historique des salons
+
+        :param channel: Salon à parcourir, par défaut tous les salons lisibles du serveur
+        """
+        guild = interaction.guild
+        boards = dict(self.get_boards(guild))
+        if not boards:
+            return await interaction.response.send_message("**Erreur ·** Aucun salon Starboard n'est configuré (`/star addboard`)", ephemeral=True)
+        if guild.id in self._backfills:
+            return await interaction.response.send_message("**Erreur ·** Un rattrapage est déjà en cours sur ce serveur", ephemeral=True)
+        
+        if channel:
+            channels = [channel]
+        else:
+            board_channels = {b.channel_id for b in boards.values()}
+            channels = [c for c in guild.text_channels if c.permissions_for(guild.me).read_message_history and c.id not in board_channels]
+        progress = {'channels': 0, 'messages': 0, 'votes': 0, 'posted': 0}
+        
+        def progress_text(done: bool = False) -> str:
+            status = "**Rattrapage terminé ·**" if done else "**Rattrapage en cours ·**"
+            return f"{status} {progress['channels']}/{len(channels)} salon(s), {progress['messages']} message(s) parcourus, {progress['votes']} vote(s) ajoutés, {progress['posted']} message(s) publiés"
+        
+        await interaction.response.send_message(f"**Rattrapage lancé ·** {len(channels)} salon(s) à parcourir", ephemeral=True)
+        status_msg = await interaction.channel.send(progress_text())
+        self._backfills.add(guild.id)
+        semaphore = asyncio.Semaphore(BACKFILL_CONCURRENCY)
+        
+        async def run(c: discord.TextChannel):
+            async with semaphore:
+                try:
+                    await self.backfill_channel(c, boards, progress)
+                except discord.HTTPException as e:
+                    logger.warning(f"Rattrapage impossible dans #{c} : {e}")
+                except Exception as e: # Une erreur dans un salon ne doit pas interrompre les autres
+                    logger.error(f"Erreur lors du rattrapage de #{c} : {e}", exc_info=True)
+                    
+        async def report():
+            while True:
+                await asyncio.sleep(BACKFILL_PROGRESS_INTERVAL)
+                try:
+                    await status_msg.edit(content=progress_text())
+                except discord.HTTPException: # Message de progression supprimé
+                    return
+        
+        reporter = asyncio.create_task(report())
+        try:
+            await asyncio.gather(*[run(c) for c in channels])
+        finally:
+            reporter.cancel()
+            self._backfills.discard(guild.id)
+        try:
+            await status_msg.edit(content=progress_text(done=True))
+        except discord.HTTPException:
+            logger.info(f"{progress_text(done=True)} ({guild.name}, message de progression supprimé)")
+        
+    @app_commands.command(name="top")
+    @app_commands.guild_only
+    @app_commands.choices(period=LEADERBOARD_PERIODS, kind=LEADERBOARD_KINDS)
+    async def show_leaderboard(self, interaction: discord.Interaction, period: str = 'week', kind: str = 'author', emoji: Optional[str] = None):
+        """Afficher le classement des auteurs, messages ou salons les plus étoilés
+
+        :param period: Période du classement
+        :param kind: Type de classement
+        :param emoji: Emoji du salon Starboard, par défaut le premier configuré
+        """
+        guild = interaction.guild
+        boards = self.get_boards(guild)
+        if emoji:
+            board = boards.get(emoji_key(discord.PartialEmoji.from_str(emoji.strip())))
+        else:
+            board = next(iter(boards.values()), None)
+        if not board:
+            return await interaction.response.send_message("**Erreur ·** Aucun salon Starboard ne correspond", ephemeral=True)
+
+        ranking = self.get_leaderboard(guild, board.emoji, period, kind)
+        period_name = 'cette semaine' if period == 'week' else 'ce mois-ci'
+        if not ranking:
+            return await interaction.response.send_message(f"**Classement vide ·** Aucun vote {board.label} n'a été enregistré {period_name}", ephemeral=True)
+        
+        lines = []
+        for rank, (target_id, channel_id, stars) in enumerate(ranking, start=1):
+            if kind == 'author':
+                label = f"<@{target_id}>"
+            elif kind == 'channel':
+                label = f"<#{target_id}>"
+            else:
+                label = f"[Message](https://discord.com/channels/{guild.id}/{channel_id}/{target_id}) dans <#{channel_id}>"
+            lines.append(f"**{rank}.** {label} · {board.label} {stars}")
+        title = {'author': "Auteurs", 'message': "Messages", 'channel': "Salons"}[kind]
+        em = discord.Embed(title=f"{title} les plus votés {period_name} ({board.label})", description='\n'.join(lines), color=0x2F3136)
+        await interaction.response.send_message(embed=em)
+
+    @app_commands.command(name="addboard")
+    @app_commands.guild_only
+    @app_commands.checks.has_permissions(manage_messages=True)
+    async def add_board(self, interaction: discord.Interaction, emoji: str, channel: discord.TextChannel, threshold: app_commands.Range[int, 1] = DEFAULT_THRESHOLD):
+        """Associer un emoji à un salon Starboard (remplace l'association existante)
+
+        :param emoji: Emoji de vote
+        :param channel: Salon où publier les messages retenus
+        :param threshold: Nombre de votes nécessaires pour publier un message
+        """
+        partial = discord.PartialEmoji.from_str(emoji.strip())
+        if partial.id:
+            if not interaction.guild.get_emoji(partial.id):
+                return await interaction.response.send_message("**Erreur ·** Cet emoji personnalisé n'appartient pas à ce serveur", ephemeral=True)
+        elif not is_unicode_emoji(partial.name):
+            return await interaction.response.send_message("**Erreur ·** Cet emoji n'est pas valide", ephemeral=True)
+        board = Board(emoji_key(partial), str(partial), channel.id, threshold)
+        self.set_board(interaction.guild, board)
+        await interaction.response.send_message(f"**Succès ·** Les messages recevant {threshold} {board.label} seront publiés sur {channel.mention}", ephemeral=True)
+
+    @app_commands.command(name="removeboard")
+    @app_commands.guild_only
+    @app_commands.checks.has_permissions(manage_messages=True)
+    async def remove_board_command(self, interaction: discord.Interaction, emoji: str):
+        """Retirer le salon Starboard associé à un emoji
+
+        :param emoji: Emoji de vote
+        """
+        if not self.remove_board(interaction.guild, emoji_key(discord.PartialEmoji.from_str(emoji.strip()))):
+            return await interaction.response.send_message(f"**Erreur ·** Aucun salon Starboard n'est associé à {emoji}", ephemeral=True)
+        await interaction.response.send_message(f"**Succès ·** Le salon Starboard associé à {emoji} a été retiré", ephemeral=True)
+
+    @remove_board_command.autocomplete('emoji')
+    async def autocomplete_board(self, interaction: discord.Interaction, current: str):
+        boards = tuple(self.get_boards(interaction.guild).values())
+        found = fuzzy.finder(current, boards, key=lambda b: b.label)
+        return [app_commands.Choice(name=f'{b.label} → #{interaction.guild.get_channel(b.channel_id) or b.channel_id}', value=b.label) for b in found][:25]
+
+    @app_commands.command(name="boards")
+    @app_commands.guild_only
+    async def list_boards(self, interaction: discord.Interaction):
+        """Afficher les salons Starboard du serveur"""
+        boards = self.get_boards(interaction.guild)
+        if not boards:
+            return await interaction.response.send_message("**Aucun salon Starboard ·** Utilisez `/star addboard` pour en configurer un", ephemeral=True)
+        lines = [f"{b.label} → <#{b.channel_id}> · {b.threshold} vote(s)" for b in boards.values()]
+        em = discord.Embed(title="Salons Starboard", description='\n'.join(lines), color=0x2F3136)
+        await interaction.response.send_message(embed=em, ephemeral=True)
         
     @app_commands.command(name="set")
     @app_commands.guild_only
@@ -1,64 +1,504 @@
+import hashlib
+import heapq
 import io
 import json
 import logging
+import multiprocessing.pool
+import os
 import re
-from typing import Any, List, Tuple
+import tempfile
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Coroutine, Dict, Hashable, List, Optional, Set, Tuple, Union
+from urllib.parse import urlsplit, urlunsplit
 
+try:
+    from re import _constants as sre_constants, _parser as sre_parse
+except ImportError: # Python < 3.11
+    import sre_constants, sre_parse
+
+import aiohttp
 import discord
 import asyncio
-import requests
 from discord import app_commands
-from discord.ext import commands
+from discord.ext import commands, tasks
 
-from common.dataio import get_sqlite_database
-from common.utils import fuzzy
+from common.dataio import get_sqlite_database, get_data_folder
+from common.utils import fuzzy, pretty
+from common.utils.ahocorasick import AhoCorasick
 
 logger = logging.getLogger('ctrlshift.Triggers')
 
 DEFAULT_SETTINGS : List[Tuple[str, Any]] = [
     ('fxTwitter', 1),
-    ('TikTokPreview', 1)
+    ('TikTokPreview', 1),
+    ('CustomTriggers', 1)
+]
+
+# (nom, paramètre d'activation, domaines, motif) — le nom sert de groupe nommé dans le motif combiné
+# Pour ajouter un réécrivain de lien : une entrée ici et un gestionnaire dans Triggers._link_handlers
+LINK_TRIGGERS : List[Tuple[str, str, Tuple[str, ...], str]] = [
+    ('fxtwitter', 'fxTwitter', ('twitter.com', 'x.com'), r"(?<![\w.-])(?:https?:\/\/)?(?:[\w-]+\.)?(?:twitter|x)\.com\/(?P<fxtwitter_path>[\w\d\/]*)"),
+    ('tiktok', 'TikTokPreview', ('tiktok.com',), r"https:\/\/(?:vm|www)?\.tiktok\.com\/[0-z\/]*")
 ]
+LINK_PATTERN = re.compile('|'.join(f"(?P<{name}>{pattern})" for name, _, _, pattern in LINK_TRIGGERS))
+
+MAX_ATTACHMENT_SIZE = 8 * 1024 * 1024 # Limite d'envoi de fichiers de Discord
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+DOWNLOAD_TIMEOUT = 15
+MAX_CONCURRENT_DOWNLOADS = 4 # Tous serveurs confondus, pour ménager la bande passante et la mémoire
+
+MEDIA_VIDEO, MEDIA_TOO_LARGE, MEDIA_NOT_VIDEO, MEDIA_REPOSTED = ('video', 'too_large', 'not_video', 'reposted')
+MEDIA_CACHE_BUDGET = 512 * 1024 * 1024 # Taille max. des vidéos gardées sur disque
+MEDIA_CACHE_TTL = 3 * 86400
+MEDIA_CACHE_NEGATIVE_TTL = 6 * 3600 # Durée de conservation des résultats 'trop volumineux' / 'pas une vidéo'
+
+# Pré-filtre : suffixes de domaine ('.com/'...), partagés par la plupart des réécrivains donc sans coût supplémentaire par ajout
+LINK_PREFILTER = tuple({'.' + domain.rsplit('.', 1)[-1] + '/' for _, _, domains, _ in LINK_TRIGGERS for domain in domains})
+
+DUPLICATE_CHANNEL_WINDOW = 300 # Un lien déjà traité dans le salon pendant cette durée est ignoré (secondes)
+DUPLICATE_GUILD_WINDOW = 1800 # Une vidéo déjà envoyée sur le serveur pendant cette durée est reprise par son lien Discord (secondes)
+DUPLICATE_MAX_ENTRIES = 5000
+
+BUTTON_TIMEOUT = 10 # Durée d'affichage des boutons d'annulation (secondes)
+TRIGGER_BUTTONS = {
+    'unfx': ('Annuler FxTwitter', discord.ButtonStyle.red),
+    'restore': ('Rétablir les previews', discord.ButtonStyle.blurple)
+}
+
+CUSTOM_PATTERN_MAX_LENGTH = 200
+CUSTOM_RESPONSE_MAX_LENGTH = 2000
+REGEX_REPEATS = {sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT, getattr(sre_constants, 'POSSESSIVE_REPEAT', sre_constants.MAX_REPEAT)}
+REGEX_GROUPREFS = {sre_constants.GROUPREF, sre_constants.GROUPREF_EXISTS, sre_constants.GROUPREF_IGNORE}
+REGEX_TIMEOUT = 0.5 # Durée max. de la recherche des regex personnalisées d'un message (secondes)
+
+
+def _regex_subpatterns(av: Any) -> List[sre_parse.SubPattern]:
+    """Sous-motifs directs d'un nœud de regex analysée"""
+    found = []
+    for item in (av if isinstance(av, (tuple, list)) else (av,)):
+        if isinstance(item, sre_parse.SubPattern):
+            found.append(item)
+        elif isinstance(item, list):
+            found.extend(i for i in item if isinstance(i, sre_parse.SubPattern))
+    return found
+
+def _regex_first_chars(items: sre_parse.SubPattern) -> Optional[Set[str]]:
+    """Caractères par lesquels un sous-motif peut commencer (en minuscules), ou None s'ils ne sont pas connus avec certitude"""
+    if not items:
+        return None # Peut correspondre à une chaîne vide
+    op, av = items[0]
+    if op == sre_constants.LITERAL:
+        return {chr(av).lower()}
+    if op == sre_constants.IN and all(o == sre_constants.LITERAL for o, _ in av):
+        return {chr(v).lower() for _, v in av}
+    if op == sre_constants.SUBPATTERN:
+        return _regex_first_chars(av[-1])
+    if op == sre_constants.BRANCH:
+        found = set()
+        for branch in av[1]:
+            chars = _regex_first_chars(branch)
+            if chars is None:
+                return None
+            found |= chars
+        return found
+    return None
+
+def _check_regex_backtracking(items: sre_parse.SubPattern, repeated: bool = False):
+    """Lève une ValueError sur les constructions qui peuvent faire exploser le temps de recherche
+    (quantificateurs de longueur variable imbriqués, alternatives qui se chevauchent sous un quantificateur, références arrière)"""
+    for op, av in items:
+        if op in REGEX_GROUPREFS:
+            raise ValueError("Les références arrière (`\\1`...) ne sont pas supportées")
+        if op in REGEX_REPEATS:
+            low, high, sub = av
+            if repeated and low != high:
+                raise ValueError("Les quantificateurs imbriqués (ex. `(a+)+`) ne sont pas supportés")
+            _check_regex_backtracking(sub, repeated or high > 1)
+            continue
+        if op == sre_constants.BRANCH and repeated:
+            seen = set()
+            for branch in av[1]:
+                chars = _regex_first_chars(branch)
+                if chars is None or chars & seen:
+                    raise ValueError("Les alternatives qui peuvent se chevaucher sous un quantificateur (ex. `(a|aa)*`) ne sont pas supportées")
+                seen |= chars
+        for sub in _regex_subpatterns(av):
+            _check_regex_backtracking(sub, repeated)
+
+
+class CustomTriggerSet:
+    """Triggers personnalisés d'un serveur, compilés en un seul automate
+
+    Les mots-clés passent par un automate d'Aho-Corasick (insensible à la casse, mots entiers) dont le coût
+    de recherche ne dépend pas de leur nombre ; les regex sont combinées en un seul motif à groupes nommés,
+    dont le coût croît avec le nombre de regex. Tout ajout de mot-clé reconstruit l'automate entier et toute modification
+    d'une regex recompile le motif combiné, paresseusement au message suivant ; un retrait de mot-clé ne reconstruit rien.
+    Le motif combiné est exécuté hors de la boucle d'événements avec un délai maximal (voir RegexWorker) ; validate() refuse
+    en plus les constructions les plus exposées aux retours arrière catastrophiques et les références arrière, faussées par la combinaison.
+    """
+    
+    def __init__(self):
+        self.triggers : Dict[int, Tuple[str, bool, str]] = {}
+        self._literals = AhoCorasick()
+        self._regexes : Dict[int, str] = {}
+        self._combined : Optional[str] = None
+        self._regex_dirty = False
+        
+    def __len__(self) -> int:
+        return len(self.triggers)
+        
+    @staticmethod
+    def validate(pattern: str, is_regex: bool):
+        """Lève une ValueError si le motif ne peut pas être utilisé"""
+        if not pattern.strip():
+            raise ValueError("Le motif ne peut pas être vide")
+        if len(pattern) > CUSTOM_PATTERN_MAX_LENGTH:
+            raise ValueError(f"Le motif ne peut pas dépasser {CUSTOM_PATTERN_MAX_LENGTH} caractères")
+        if is_regex:
+            if '(?P<' in pattern or '(?P=' in pattern:
+                raise ValueError("Les groupes nommés ne sont pas supportés")
+            try:
+                _check_regex_backtracking(sre_parse.parse(pattern, re.IGNORECASE))
+                re.compile(f"(?P<t0>{pattern})", re.IGNORECASE)
+            except re.error as e:
+                raise ValueError(f"Regex invalide : {e}")
+    
+    def add(self, trigger_id: int, pattern: str, is_regex: bool, response: str):
+        self.triggers[trigger_id] = (pattern, is_regex, response)
+        if is_regex:
+            self._regexes[trigger_id] = pattern
+            self._regex_dirty = True
+        else:
+            self._literals.add(pattern.lower(), trigger_id)
+            
+    def remove(self, trigger_id: int):
+        pattern, is_regex, _ = self.triggers.pop(trigger_id)
+        if is_regex:
+            del self._regexes[trigger_id]
+            self._regex_dirty = True
+        else:
+            self._literals.remove(pattern.lower(), trigger_id)
+            
+    def match_keywords(self, content: str) -> Optional[Tuple[int, int]]:
+        """Renvoie la position et l'identifiant du mot-clé qui correspond le plus tôt dans le texte"""
+        best = None
+        if len(self._literals):
+            text = content.lower()
+            for start, end, trigger_id in self._literals.iter(text):
+                if (start > 0 and text[start - 1].isalnum()) or (end < len(text) and text[end].isalnum()):
+                    continue
+                if best is None or start < best[0]:
+                    best = (start, trigger_id)
+        return best
+    
+    @property
+    def regex_pattern(self) -> Optional[str]:
+        """Motif combiné des regex (chaque regex dans un groupe nommé 't<id>'), ou None s'il n'y en a pas"""
+        if self._regex_dirty:
+            self._combined = '|'.join(f"(?P<t{i}>{p})" for i, p in self._regexes.items()) if self._regexes else None
+            self._regex_dirty = False
+        return self._combined
+
+def _regex_search(pattern: str, content: str) -> Optional[Tuple[int, str]]:
+    """Exécutée dans le processus de RegexWorker : renvoie la position et le groupe de la première correspondance"""
+    m = re.search(pattern, content, re.IGNORECASE) # Les motifs compilés sont gardés en cache par le module re
+    return (m.start(), m.lastgroup) if m else None
+
+class RegexWorker:
+    """Processus dédié aux regex personnalisées, pour qu'une regex trop lente ne bloque pas le bot
+    Une recherche qui dépasse le délai arrête le processus, remplacé à la recherche suivante
+    """
+    
+    def __init__(self, timeout: float = REGEX_TIMEOUT):
+        self.timeout = timeout
+        self._pool : Optional[multiprocessing.pool.Pool] = None
+        
+    async def search(self, pattern: str, content: str) -> Optional[Tuple[int, str]]:
+        """Cherche le motif dans le texte (insensible à la casse)
+
+        :raises asyncio.TimeoutError: Si la recherche dépasse le délai
+        :return: Position et nom du groupe de la première correspondance
+        """
+        if self._pool is None:
+            self._pool = multiprocessing.Pool(1)
+        pool = self._pool
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        
+        def resolve(setter: Callable, value: Any):
+            if not future.done():
+                setter(value)
+        pool.apply_async(_regex_search, (pattern, content),
+                         callback=lambda r: loop.call_soon_threadsafe(resolve, future.set_result, r),
+                         error_callback=lambda e: loop.call_soon_threadsafe(resolve, future.set_exception, e))
+        try:
+            return await asyncio.wait_for(future, self.timeout)
+        except asyncio.TimeoutError:
+            if self._pool is pool:
+                self._pool = None
+                await asyncio.to_thread(pool.terminate)
+            raise
+        
+    def close(self):
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool = None
+
+def normalize_link(url: str) -> str:
+    """Normalise un lien pour le comparer à d'autres (schéma, casse de l'hôte, paramètres et '/' final ignorés)"""
+    url = url.strip()
+    if '://' not in url:
+        url = 'https://' + url
+    parts = urlsplit(url)
+    return urlunsplit(('https', parts.netloc.lower(), parts.path.rstrip('/'), '', ''))
 
-class RestorePreviewButton(discord.ui.View):
-    def __init__(self, message: discord.Message):
-        super().__init__()
-        self.message = message
-        self.value : bool = False
 
-    @discord.ui.button(label="Rétablir les previews", style=discord.ButtonStyle.blurple)
-    async def confirm(self, interaction: discord.Interaction, button: discord.ui.Button):
-        self.value = True
-        self.stop()
+class RecentLinks:
+    """Liens récemment traités, sur une fenêtre de temps glissante et avec un nombre d'entrées borné"""
+    
+    def __init__(self, window: float, max_entries: int = DUPLICATE_MAX_ENTRIES):
+        self.window = window
+        self.max_entries = max_entries
+        self._entries : OrderedDict[Hashable, Tuple[float, Any]] = OrderedDict()
         
-    async def interaction_check(self, interaction: discord.Interaction):
-        return interaction.user.id == self.message.author.id
+    def _expire(self, now: float):
+        while self._entries:
+            key, (added, _) = next(iter(self._entries.items()))
+            if added + self.window > now and len(self._entries) <= self.max_entries:
+                break
+            del self._entries[key]
+        
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Renvoie la valeur associée au lien s'il a été vu dans la fenêtre"""
+        entry = self._entries.get(key)
+        if entry and entry[0] + self.window > time.monotonic():
+            return entry[1]
+        return None
+    
+    def add(self, key: Hashable, value: Any = True):
+        now = time.monotonic()
+        self._entries[key] = (now, value)
+        self._entries.move_to_end(key)
+        self._expire(now)
+
+
+class MediaCache:
+    """Cache disque LRU des médias récupérés par les triggers, adressé par URL normalisée
+
+    Les résultats négatifs (trop volumineux, pas une vidéo) sont aussi gardés pour éviter de retélécharger.
+    Les méthodes font des I/O bloquantes : à appeler via asyncio.to_thread()
+    """
+    
+    def __init__(self, budget: int = MEDIA_CACHE_BUDGET, ttl: int = MEDIA_CACHE_TTL, negative_ttl: int = MEDIA_CACHE_NEGATIVE_TTL):
+        self.folder = get_data_folder('triggers/media')
+        self.budget = budget
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        
+        conn = get_sqlite_database('triggers', 'media')
+        cursor = conn.cursor()
+        cursor.execute("CREATE TABLE IF NOT EXISTS media (key TEXT PRIMARY KEY, status TEXT, size INTEGER, created_at REAL, last_access REAL)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS media_last_access ON media (last_access)")
+        conn.commit()
+        cursor.close()
+        conn.close()
+        
+    def _key(self, url: str) -> str:
+        return hashlib.sha256(normalize_link(url).encode()).hexdigest()
+    
+    def _path(self, key: str) -> Path:
+        return self.folder / f'{key}.mp4'
+    
+    def get(self, url: str) -> Optional[Tuple[str, Optional[bytes]]]:
+        """Renvoie (statut, contenu de la vidéo) si l'URL est en cache et n'a pas expiré
+
+        Le fichier est lu ici même : une éviction concurrente ne peut pas le retirer entre la recherche et l'envoi
+        """
+        key = self._key(url)
+        conn = get_sqlite_database('triggers', 'media')
+        cursor = conn.cursor()
+        cursor.execute("SELECT status, created_at FROM media WHERE key=?", (key,))
+        row = cursor.fetchone()
+        result = None
+        if row:
+            status, created_at = row
+            ttl = self.ttl if status == MEDIA_VIDEO else self.negative_ttl
+            path = self._path(key)
+            data = None
+            if created_at + ttl >= time.time():
+                try:
+                    data = path.read_bytes() if status == MEDIA_VIDEO else None
+                    result = (status, data)
+                except FileNotFoundError:
+                    pass
+            if result:
+                cursor.execute("UPDATE media SET last_access=? WHERE key=?", (time.time(), key))
+            else:
+                cursor.execute("DELETE FROM media WHERE key=?", (key,))
+                path.unlink(missing_ok=True)
+        conn.commit()
+        cursor.close()
+        conn.close()
+        return result
     
-class RemoveFxButton(discord.ui.View):
-    def __init__(self, message: discord.Message):
-        super().__init__()
-        self.message = message
-        self.value : bool = False
+    def put(self, url: str, status: str, data: Optional[bytes] = None):
+        """Enregistre un résultat (et le contenu de la vidéo le cas échéant), puis évince les plus anciens au-delà du budget"""
+        key = self._key(url)
+        size = 0
+        if data is not None:
+            # Fichier temporaire propre à chaque écriture, remplacé atomiquement
+            tmp = tempfile.NamedTemporaryFile(dir=self.folder, suffix='.tmp', delete=False)
+            try:
+                with tmp:
+                    tmp.write(data)
+                os.replace(tmp.name, self._path(key))
+            except OSError:
+                Path(tmp.name).unlink(missing_ok=True)
+                raise
+            size = len(data)
+        now = time.time()
+        conn = get_sqlite_database('triggers', 'media')
+        cursor = conn.cursor()
+        cursor.execute("INSERT OR REPLACE INTO media VALUES (?, ?, ?, ?, ?)", (key, status, size, now, now))
+        cursor.execute("SELECT COALESCE(SUM(size), 0) FROM media")
+        total = cursor.fetchone()[0]
+        while total > self.budget:
+            cursor.execute("SELECT key, size FROM media WHERE size > 0 AND key != ? ORDER BY last_access LIMIT 20", (key,))
+            oldest = cursor.fetchall()
+            if not oldest:
+                break
+            for old_key, old_size in oldest:
+                self._path(old_key).unlink(missing_ok=True)
+                cursor.execute("DELETE FROM media WHERE key=?", (old_key,))
+                total -= old_size
+                if total <= self.budget:
+                    break
+        conn.commit()
+        cursor.close()
+        conn.close()
+
 
-    @discord.ui.button(label='Annuler FxTwitter', style=discord.ButtonStyle.red)
-    async def confirm(self, interaction: discord.Interaction, button: discord.ui.Button):
-        self.value = True
-        self.stop()
+class TriggerButtonView(discord.ui.View):
+    """Bouton persistant des réponses des triggers
+
+    Une seule instance enregistrée par type (via bot.add_view) traite les clics de toutes les réponses ;
+    les instances envoyées avec les messages sont arrêtées d'emblée pour ne pas être conservées par message.
+    """
+    def __init__(self, cog: 'Triggers', kind: str):
+        super().__init__(timeout=None)
+        self._cog = cog
+        self.kind = kind
+        label, style = TRIGGER_BUTTONS[kind]
+        button = discord.ui.Button(label=label, style=style, custom_id=f'triggers:{kind}')
+        button.callback = self.button_callback
+        self.add_item(button)
         
-    async def interaction_check(self, interaction: discord.Interaction):
-        return interaction.user.id == self.message.author.id
+    async def button_callback(self, interaction: discord.Interaction):
+        await self._cog.handle_trigger_button(self.kind, interaction)
     
 
 class Triggers(commands.GroupCog, group_name="trig", description="Collection de triggers utiles"):
     """Collection de triggers utiles"""
     def __init__(self, bot: commands.Bot) -> None:
         self.bot = bot
-        self.session = requests.Session()
+        self.session : Optional[aiohttp.ClientSession] = None
+        self._tasks : Set[asyncio.Task] = set()
+        self._download_semaphore = asyncio.Semaphore(MAX_CONCURRENT_DOWNLOADS)
+        self.media_cache = MediaCache()
+        self._media_inflight : Dict[str, asyncio.Future] = {}
+        self._custom_triggers : Dict[int, CustomTriggerSet] = {}
+        self.regex_worker = RegexWorker()
+        self._recent_channel_links = RecentLinks(DUPLICATE_CHANNEL_WINDOW)
+        self._pending_channel_links : Set[Tuple[int, str]] = set() # Liens en cours de traitement, par salon
+        self._recent_guild_media = RecentLinks(DUPLICATE_GUILD_WINDOW)
+        
+        # Boutons en attente : id de la réponse -> (type, id de l'auteur, id du salon, id du message d'origine)
+        self._buttons : Dict[int, Tuple[str, int, int, int]] = {}
+        self._button_expiry : List[Tuple[float, int]] = []
+        self._persistent_views : List[TriggerButtonView] = []
+        self._button_templates = {kind: TriggerButtonView(self, kind) for kind in TRIGGER_BUTTONS}
+        for view in self._button_templates.values():
+            view.stop()
+        self._link_handlers = {
+            'fxtwitter': self.post_fxtwitter,
+            'tiktok': self.preview_tiktok
+        }
         
         self.preview_emoji = self.bot.get_emoji(1072957045407494294)
         
-    def cog_unload(self) -> None:
-        self.session.close()
+    async def cog_load(self) -> None:
+        self.session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=DOWNLOAD_TIMEOUT))
+        for kind in TRIGGER_BUTTONS:
+            view = TriggerButtonView(self, kind)
+            self.bot.add_view(view)
+            self._persistent_views.append(view)
+        self.task_expire_buttons.start()
+        
+    async def cog_unload(self) -> None:
+        self.task_expire_buttons.cancel()
+        for view in self._persistent_views: # Retire aussi la vue du répartiteur du bot
+            view.stop()
+        self._persistent_views.clear()
+        self.regex_worker.close()
+        for task in self._tasks:
+            task.cancel()
+        if self.session:
+            await self.session.close()
+        
+    def _spawn(self, coro: Coroutine) -> asyncio.Task:
+        """Lance une coroutine en tâche de fond indépendante (gardée en référence jusqu'à sa fin)"""
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._task_done)
+        return task
+    
+    def _task_done(self, task: asyncio.Task):
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception():
+            logger.error(f"Erreur dans un trigger : {task.exception()}", exc_info=task.exception())
+        
+    @tasks.loop(seconds=1)
+    async def task_expire_buttons(self):
+        """Retire en lot les boutons des réponses arrivés à expiration"""
+        now = time.monotonic()
+        due = []
+        while self._button_expiry and self._button_expiry[0][0] <= now:
+            _, reply_id = heapq.heappop(self._button_expiry)
+            entry = self._buttons.pop(reply_id, None)
+            if entry:
+                due.append((reply_id, entry[2]))
+        if due:
+            await asyncio.gather(*(self._remove_button(channel_id, reply_id) for reply_id, channel_id in due), return_exceptions=True)
+            
+    async def _remove_button(self, channel_id: int, reply_id: int):
+        channel = self.bot.get_channel(channel_id)
+        if channel:
+            await channel.get_partial_message(reply_id).edit(view=None)
+            
+    def schedule_button(self, kind: str, message: discord.Message, reply: discord.Message):
+        """Enregistre le bouton d'une réponse auprès du répartiteur et planifie son retrait"""
+        self._buttons[reply.id] = (kind, message.author.id, message.channel.id, message.id)
+        heapq.heappush(self._button_expiry, (time.monotonic() + BUTTON_TIMEOUT, reply.id))
+        
+    async def handle_trigger_button(self, kind: str, interaction: discord.Interaction):
+        """Traite le clic sur un bouton de réponse, quelle que soit la réponse concernée"""
+        entry = self._buttons.get(interaction.message.id)
+        if not entry:
+            return await interaction.response.edit_message(view=None)
+        _, author_id, channel_id, message_id = entry
+        if interaction.user.id != author_id:
+            return await interaction.response.send_message("Seul l'auteur du message d'origine peut utiliser ce bouton.", ephemeral=True)
+        del self._buttons[interaction.message.id]
+        original = interaction.channel.get_partial_message(message_id)
+        if kind == 'unfx':
+            await interaction.response.defer()
+            await original.edit(suppress=False)
+            await interaction.message.delete()
+        else:
+            await interaction.response.edit_message(view=None)
+            await original.edit(suppress=False)
         
     @commands.Cog.listener()
     async def on_ready(self):
@@ -74,6 +514,7 @@ class Triggers(commands.GroupCog, group_name="trig", description="Collection de
             conn = get_sqlite_database('triggers', f'g{g.id}')
             cursor = conn.cursor()
             cursor.execute("CREATE TABLE IF NOT EXISTS settings (name TEXT PRIMARY KEY, value TEXT)")
+            cursor.execute("CREATE TABLE IF NOT EXISTS custom (id INTEGER PRIMARY KEY AUTOINCREMENT, pattern TEXT, is_regex INTEGER, response TEXT, author_id INTEGER)")
             for name, default_value in DEFAULT_SETTINGS:
                 cursor.execute("INSERT OR IGNORE INTO settings (name, value) VALUES (?, ?)", (name, json.dumps(default_value)))
             conn.commit()
@@ -110,66 +551,206 @@ class Triggers(commands.GroupCog, group_name="trig", description="Collection de
         cursor.close()
         conn.close()
         
-    # FONCTIONS
+    def get_custom_triggers(self, guild: discord.Guild) -> CustomTriggerSet:
+        """Renvoie les triggers personnalisés du serveur (chargés une seule fois puis tenus à jour en mémoire)
+
+        :param guild: Serveur concerné
+        :return: CustomTriggerSet
+        """
+        if guild.id not in self._custom_triggers:
+            custom = CustomTriggerSet()
+            conn = get_sqlite_database('triggers', f'g{guild.id}')
+            cursor = conn.cursor()
+            cursor.execute("CREATE TABLE IF NOT EXISTS custom (id INTEGER PRIMARY KEY AUTOINCREMENT, pattern TEXT, is_regex INTEGER, response TEXT, author_id INTEGER)")
+            cursor.execute("SELECT id, pattern, is_regex, response FROM custom")
+            for trigger_id, pattern, is_regex, response in cursor.fetchall():
+                try:
+                    CustomTriggerSet.validate(pattern, bool(is_regex))
+                except ValueError as e:
+                    logger.warning(f"Trigger #{trigger_id} de {guild.id} ignoré : {e}")
+                    continue
+                custom.add(trigger_id, pattern, bool(is_regex), response)
+            cursor.close()
+            conn.close()
+            self._custom_triggers[guild.id] = custom
+        return self._custom_triggers[guild.id]
+    
+    def add_custom_trigger(self, guild: discord.Guild, pattern: str, is_regex: bool, response: str, author: discord.abc.User) -> int:
+        """Ajoute un trigger personnalisé et met à jour l'automate du serveur
+
+        :return: Identifiant du trigger
+        """
+        CustomTriggerSet.validate(pattern, is_regex)
+        conn = get_sqlite_database('triggers', f'g{guild.id}')
+        cursor = conn.cursor()
+        cursor.execute("INSERT INTO custom (pattern, is_regex, response, author_id) VALUES (?, ?, ?, ?)", (pattern, int(is_regex), response, author.id))
+        trigger_id = cursor.lastrowid
+        conn.commit()
+        cursor.close()
+        conn.close()
+        self.get_custom_triggers(guild).add(trigger_id, pattern, is_regex, response)
+        return trigger_id
+    
+    def remove_custom_trigger(self, guild: discord.Guild, trigger_id: int) -> bool:
+        custom = self.get_custom_triggers(guild)
+        if trigger_id not in custom.triggers:
+            return False
+        conn = get_sqlite_database('triggers', f'g{guild.id}')
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM custom WHERE id=?", (trigger_id,))
+        conn.commit()
+        cursor.close()
+        conn.close()
+        custom.remove(trigger_id)
+        return True
         
-    async def post_fxtwitter(self, message: discord.Message):
-        settings = self.get_guild_settings(message.guild)
-        if not int(settings['fxTwitter']):
-            return
-        result = re.findall(r"(?:https?:\/\/)?(?:www\.)?twitter\.com\/([\w\d\/]*)", message.content)
-        chunks = []
-        for r in result:
-            chunks.append(f"https://fxtwitter.com/{r}")
-        if len(result) == 0:
-            return
+    # FONCTIONS
+    
+    async def match_custom_trigger(self, guild: discord.Guild, custom: CustomTriggerSet, content: str) -> Optional[int]:
+        """Renvoie l'identifiant du trigger personnalisé qui correspond le plus tôt dans le texte
+
+        :param guild: Serveur des triggers
+        :param custom: Triggers personnalisés du serveur
+        :param content: Texte du message
+        """
+        best = custom.match_keywords(content)
+        pattern = custom.regex_pattern
+        if pattern:
+            try:
+                found = await self.regex_worker.search(pattern, content)
+            except asyncio.TimeoutError:
+                logger.warning(f"Regex personnalisées de {guild.id} trop lentes ({len(content)} caractères), message ignoré")
+                found = None
+            if found and (best is None or found[0] < best[0]):
+                best = (found[0], int(found[1][1:]))
+        return best[1] if best else None
+    
+    def match_links(self, content: str) -> Dict[str, List[re.Match]]:
+        """Renvoie les liens reconnus dans le texte, regroupés par trigger, en une seule passe du motif combiné"""
+        if not any(hint in content for hint in LINK_PREFILTER):
+            return {}
+        matches = {}
+        for m in LINK_PATTERN.finditer(content):
+            matches.setdefault(m.lastgroup, []).append(m)
+        return matches
+    
+    def filter_duplicate_links(self, channel: discord.abc.GuildChannel, matches: Dict[str, List[re.Match]]) -> Dict[str, List[re.Match]]:
+        """Retire les liens déjà traités récemment ou en cours de traitement dans ce salon (ou répétés dans le même message)
+        Les liens retenus sont réservés jusqu'à release_links()"""
+        filtered = {}
+        for name, found in matches.items():
+            for m in found:
+                key = (channel.id, normalize_link(m.group()))
+                if key in self._pending_channel_links or self._recent_channel_links.get(key):
+                    continue
+                self._pending_channel_links.add(key)
+                filtered.setdefault(name, []).append(m)
+        return filtered
+    
+    def mark_links_handled(self, channel: discord.abc.GuildChannel, matches: List[re.Match]):
+        """Enregistre les liens comme traités dans le salon, une fois la réponse envoyée"""
+        for m in matches:
+            self._recent_channel_links.add((channel.id, normalize_link(m.group())))
+            
+    def release_links(self, channel: discord.abc.GuildChannel, matches: List[re.Match]):
+        """Libère les liens réservés par filter_duplicate_links() (traités ou non)"""
+        for m in matches:
+            self._pending_channel_links.discard((channel.id, normalize_link(m.group())))
+            
+    async def _handle_links(self, name: str, message: discord.Message, matches: List[re.Match]):
+        try:
+            await self._link_handlers[name](message, matches)
+        finally:
+            self.release_links(message.channel, matches)
         
-        view = RemoveFxButton(message)
-        view.timeout = 10
+    async def post_fxtwitter(self, message: discord.Message, matches: List[re.Match]):
+        chunks = [f"https://fxtwitter.com/{m.group('fxtwitter_path')}" for m in matches]
         
         await asyncio.sleep(0.25)
         await message.edit(suppress=True)
-        rep = await message.reply('\n'.join(chunks), mention_author=False, view=view)
-        await view.wait()
-        if view.value:
-            await message.edit(suppress=False)
-            await rep.delete()
-        else:
-            await rep.edit(view=None)
-        
-    async def preview_tiktok(self, message: discord.Message):
-        settings = self.get_guild_settings(message.guild)
-        if not int(settings['TikTokPreview']):
-            return
-        result = re.findall(r"https:\/\/(?:vm|www)?\.tiktok\.com\/[0-z\/]*", message.content)
-        chunks = []
-        for r in result:
-            chunks.append(f"https://tiktok.sauce.sh/?url={r}")
-        if len(chunks) == 0:
-            return    
-        
-        view = RestorePreviewButton(message)
-        view.timeout = 10
+        rep = await message.reply('\n'.join(chunks), mention_author=False, view=self._button_templates['unfx'])
+        self.mark_links_handled(message.channel, matches)
+        self.schedule_button('unfx', message, rep)
+        
+    async def download_video(self, url: str) -> Tuple[str, Optional[bytes]]:
+        """Télécharge une vidéo MP4 en flux, en s'arrêtant dès que la limite de taille est dépassée
+
+        :param url: Adresse de la vidéo
+        :return: Statut (MEDIA_VIDEO, MEDIA_TOO_LARGE ou MEDIA_NOT_VIDEO) et contenu de la vidéo s'il a été récupéré
+        :raises aiohttp.ClientResponseError: Si le service ne répond pas avec un statut 2xx
+        """
+        async with self._download_semaphore, self.session.get(url) as resp:
+            resp.raise_for_status() # Erreur passagère du service : ni résultat, ni mise en cache
+            if resp.content_type != 'video/mp4':
+                return MEDIA_NOT_VIDEO, None
+            if resp.content_length is not None and resp.content_length >= MAX_ATTACHMENT_SIZE:
+                return MEDIA_TOO_LARGE, None
+            buffer = io.BytesIO()
+            async for chunk in resp.content.iter_chunked(DOWNLOAD_CHUNK_SIZE):
+                buffer.write(chunk)
+                if buffer.tell() >= MAX_ATTACHMENT_SIZE:
+                    return MEDIA_TOO_LARGE, None
+        return MEDIA_VIDEO, buffer.getvalue()
+    
+    async def get_tiktok_video(self, url: str) -> Tuple[str, Optional[bytes]]:
+        """Renvoie la vidéo TikTok depuis le cache disque, ou la télécharge et l'y enregistre
+        Les demandes simultanées d'un même lien partagent une seule récupération
+
+        :param url: Lien TikTok d'origine
+        :return: Statut et contenu de la vidéo
+        """
+        key = normalize_link(url)
+        future = self._media_inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self._fetch_tiktok_video(url))
+            self._media_inflight[key] = future
+            future.add_done_callback(lambda _: self._media_inflight.pop(key, None))
+        return await asyncio.shield(future)
+    
+    async def _fetch_tiktok_video(self, url: str) -> Tuple[str, Optional[bytes]]:
+        cached = await asyncio.to_thread(self.media_cache.get, url)
+        if cached:
+            return cached
+        status, video = await self.download_video(f"https://tiktok.sauce.sh/?url={url}")
+        try:
+            await asyncio.to_thread(self.media_cache.put, url, status, video)
+        except Exception as e:
+            logger.warning(f"Impossible d'enregistrer {url} dans le cache des médias : {e}", exc_info=True)
+        return status, video
+        
+    async def _resolve_tiktok(self, guild: discord.Guild, url: str) -> Tuple[str, Union[bytes, str, None]]:
+        """Reprend la pièce jointe déjà envoyée sur le serveur pour ce lien, sinon passe par le cache disque ou le téléchargement"""
+        reposted = self._recent_guild_media.get((guild.id, normalize_link(url)))
+        if reposted:
+            return MEDIA_REPOSTED, reposted
+        return await self.get_tiktok_video(url)
+        
+    async def preview_tiktok(self, message: discord.Message, matches: List[re.Match]):
+        chunks = [f"https://tiktok.sauce.sh/?url={m.group()}" for m in matches]
+        
+        view = self._button_templates['restore']
         
         attachments = []
+        attached_links = []
         raw_links = []
-        for c in chunks:
-            try:
-                r = self.session.get(c, timeout=15)
-            except Exception as e:
-                logger.warning(f"Error while fetching {c}: {e}", exc_info=True)
+        results = await asyncio.gather(*(self._resolve_tiktok(message.guild, m.group()) for m in matches), return_exceptions=True)
+        for m, c, result in zip(matches, chunks, results):
+            if isinstance(result, Exception):
+                logger.warning(f"Error while fetching {c}: {result}", exc_info=result)
                 return await message.reply(f"**Une erreur est survenue lors de la récupération de `{c}`**\nLe site Tiktok.sauce est peut-être hors-ligne.", mention_author=False)
-            if r.headers['Content-Type'] != 'video/mp4':
+            status, video = result
+            if status == MEDIA_REPOSTED:
+                raw_links.append(video)
+                continue
+            if status != MEDIA_VIDEO:
                 raw_links.append(c)
                 continue
             if c.endswith('/'):
                 link_id = c.split('/')[-2]
             else:
                 link_id = c.split('/')[-1]
-            size_mb = len(r.content) / (1024 * 1024)
-            if size_mb >= 8:
-                raw_links.append(c)
-                continue
-            attachments.append(discord.File(io.BytesIO(r.content), filename=f'{link_id}.mp4'))
+            attachments.append(discord.File(io.BytesIO(video), filename=f'{link_id}.mp4'))
+            attached_links.append(m.group())
         rep = None
         await message.edit(suppress=True)
         if attachments:
@@ -180,10 +761,10 @@ class Triggers(commands.GroupCog, group_name="trig", description="Collection de
         elif raw_links:
             rep = await message.reply('\n'.join(raw_links), mention_author=False, view=view)
         if rep:
-            await view.wait()
-            if view.value:
-                await message.edit(suppress=False)
-            await rep.edit(view=None)
+            self.mark_links_handled(message.channel, matches)
+            for link, attachment in zip(attached_links, rep.attachments):
+                self._recent_guild_media.add((message.guild.id, normalize_link(link)), attachment.url)
+            self.schedule_button('restore', message, rep)
         
     # COMMANDES
     
@@ -212,14 +793,72 @@ class Triggers(commands.GroupCog, group_name="trig", description="Collection de
         return [app_commands.Choice(name=f'{s[0]} ({s[1]})', value=s[0]) for s in tstgs]
     
     
+    @app_commands.command(name="add")
+    @app_commands.guild_only()
+    @app_commands.default_permissions(manage_messages=True)
+    async def add_custom(self, interaction: discord.Interaction, pattern: str, response: str, regex: bool = False):
+        """Ajouter un trigger personnalisé (mot-clé ou regex -> réponse)
+
+        :param pattern: Mot-clé (mot entier, insensible à la casse) ou expression régulière déclenchant la réponse
+        :param response: Réponse envoyée par le bot
+        :param regex: Interpréter le motif comme une expression régulière
+        """
+        if len(response) > CUSTOM_RESPONSE_MAX_LENGTH:
+            return await interaction.response.send_message(f"**Erreur ·** La réponse ne peut pas dépasser {CUSTOM_RESPONSE_MAX_LENGTH} caractères", ephemeral=True)
+        try:
+            trigger_id = self.add_custom_trigger(interaction.guild, pattern, regex, response, interaction.user)
+        except ValueError as e:
+            return await interaction.response.send_message(f"**Erreur ·** {e}", ephemeral=True)
+        await interaction.response.send_message(f"**Succès ·** Trigger `#{trigger_id}` ajouté pour `{pattern}`", ephemeral=True)
+        
+    @app_commands.command(name="remove")
+    @app_commands.guild_only()
+    @app_commands.default_permissions(manage_messages=True)
+    async def remove_custom(self, interaction: discord.Interaction, trigger_id: int):
+        """Retirer un trigger personnalisé
+
+        :param trigger_id: Identifiant du trigger (voir /trig list)
+        """
+        if not self.remove_custom_trigger(interaction.guild, trigger_id):
+            return await interaction.response.send_message(f"**Erreur ·** Le trigger `#{trigger_id}` n'existe pas", ephemeral=True)
+        await interaction.response.send_message(f"**Succès ·** Trigger `#{trigger_id}` retiré", ephemeral=True)
+        
+    @app_commands.command(name="list")
+    @app_commands.guild_only()
+    @app_commands.default_permissions(manage_messages=True)
+    async def list_custom(self, interaction: discord.Interaction):
+        """Lister les triggers personnalisés du serveur"""
+        custom = self.get_custom_triggers(interaction.guild)
+        if not custom:
+            return await interaction.response.send_message("**Aucun trigger ·** Ajoutez-en avec `/trig add`", ephemeral=True)
+        lines = [f"`#{i}` {'regex ' if is_regex else ''}`{pattern}` → {pretty.troncate_text(response, 50)}" for i, (pattern, is_regex, response) in sorted(custom.triggers.items())]
+        text = pretty.troncate_text('\n'.join(lines), 4000)
+        em = discord.Embed(title=f"**Triggers personnalisés** · {len(custom)}", description=text, color=0x2F3136)
+        await interaction.response.send_message(embed=em, ephemeral=True)
+    
     # TRIGGERS
     
     @commands.Cog.listener()
     async def on_message(self, message: discord.Message):
         if message.guild:
             if not message.author.bot:
-                await self.post_fxtwitter(message)
-                await self.preview_tiktok(message)
+                matches = self.match_links(message.content)
+                custom = self.get_custom_triggers(message.guild)
+                custom_id = await self.match_custom_trigger(message.guild, custom, message.content) if custom else None
+                if not matches and custom_id is None:
+                    return
+                settings = self.get_guild_settings(message.guild)
+                # Réservation des liens juste avant la répartition, pour qu'ils soient toujours libérés
+                matches = self.filter_duplicate_links(message.channel, matches) if matches else {}
+                for name, setting, _, _ in LINK_TRIGGERS:
+                    if name not in matches:
+                        continue
+                    if int(settings.get(setting, 0)):
+                        self._spawn(self._handle_links(name, message, matches[name]))
+                    else:
+                        self.release_links(message.channel, matches[name])
+                if custom_id is not None and int(settings.get('CustomTriggers', 0)):
+                    self._spawn(message.reply(custom.triggers[custom_id][2], mention_author=False, allowed_mentions=discord.AllowedMentions.none()))
         
 async def setup(bot):
     await bot.add_cog(Triggers(bot))
\ No newline at end of file
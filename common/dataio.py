@@ -39,3 +39,14 @@ def get_package_path(name: str) -> str:
     :return: str
     """
     return DEFAULT_PACKAGE_PATH + name
+
+def get_data_folder(folder_name: str) -> Path:
+    """Renvoie le dossier de stockage d'un module (fichiers hors base de données, caches...)
+    S'il n'existe pas, sera créé automatiquement
+
+    :param folder_name: Nom du dossier de stockage
+    :return: Path
+    """
+    folder = Path(DEFAULT_DATA_PATH + folder_name)
+    folder.mkdir(parents=True, exist_ok=True)
+    return folder
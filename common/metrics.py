@@ -0,0 +1,125 @@
+import bisect
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+class Histogram:
+    """Histogramme cumulatif à compartiments fixes (format Prometheus)"""
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1) # Dernier compartiment : +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> float:
+        """Estimation d'un quantile (borne haute du compartiment qui le contient)"""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            if cumulative >= target:
+                return bound
+        return float('inf')
+
+
+class MetricsRegistry:
+    """Mesures de latence, d'erreurs et d'exécutions en cours, par type ('listener', 'command'...) et par nom"""
+
+    def __init__(self):
+        self.histograms : Dict[Tuple[str, str], Histogram] = {}
+        self.errors : Dict[Tuple[str, str], int] = {}
+        self.in_flight : Dict[Tuple[str, str], int] = {}
+        self.gauges : Dict[str, float] = {}
+        self.started_at = time.time()
+
+    def start(self, kind: str, name: str) -> float:
+        """Signale le début d'une exécution et renvoie l'instant de départ à passer à finish()"""
+        key = (kind, name)
+        self.in_flight[key] = self.in_flight.get(key, 0) + 1
+        return time.perf_counter()
+
+    def finish(self, kind: str, name: str, started: float, error: bool = False):
+        self.abandon(kind, name)
+        self.observe(kind, name, time.perf_counter() - started, error)
+        
+    def abandon(self, kind: str, name: str):
+        """Signale la fin d'une exécution sans enregistrer de mesure (ex. tâche annulée)"""
+        key = (kind, name)
+        self.in_flight[key] = max(0, self.in_flight.get(key, 0) - 1)
+        
+    def observe(self, kind: str, name: str, value: float, error: bool = False):
+        """Enregistre directement une durée (en secondes) mesurée par ailleurs"""
+        key = (kind, name)
+        if key not in self.histograms:
+            self.histograms[key] = Histogram()
+        self.histograms[key].observe(value)
+        if error:
+            self.errors[key] = self.errors.get(key, 0) + 1
+            
+    def set_gauge(self, name: str, value: float):
+        """Met à jour une valeur instantanée (ex. taille d'une file d'attente)"""
+        self.gauges[name] = value
+
+    @contextmanager
+    def track(self, kind: str, name: str) -> Iterator[None]:
+        """Mesure le bloc de code (les exceptions sont comptées comme erreurs puis relancées)
+
+        Une annulation (asyncio.CancelledError, à l'arrêt ou au déchargement d'un module) n'est ni une erreur ni une durée significative : elle n'est pas mesurée
+        """
+        started = self.start(kind, name)
+        try:
+            yield
+        except Exception:
+            self.finish(kind, name, started, error=True)
+            raise
+        except BaseException:
+            self.abandon(kind, name)
+            raise
+        else:
+            self.finish(kind, name, started)
+
+    def summary(self, kind: Optional[str] = None) -> List[dict]:
+        """Résumé par mesure, trié par nombre d'appels décroissant"""
+        rows = []
+        for (k, name), hist in self.histograms.items():
+            if kind and k != kind:
+                continue
+            rows.append({'kind': k, 'name': name, 'count': hist.count, 'errors': self.errors.get((k, name), 0), 'in_flight': self.in_flight.get((k, name), 0),
+                         'mean': hist.sum / hist.count if hist.count else 0.0, 'p50': hist.quantile(0.5), 'p95': hist.quantile(0.95), 'p99': hist.quantile(0.99)})
+        return sorted(rows, key=lambda r: r['count'], reverse=True)
+
+    def render_prometheus(self) -> str:
+        """Exporte les mesures au format texte Prometheus"""
+        lines = ['# TYPE ctrlshift_handler_seconds histogram']
+        for (kind, name), hist in sorted(self.histograms.items()):
+            labels = f'kind="{kind}",name="{name}"'
+            cumulative = 0
+            for bound, count in zip(hist.buckets, hist.counts):
+                cumulative += count
+                lines.append(f'ctrlshift_handler_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'ctrlshift_handler_seconds_bucket{{{labels},le="+Inf"}} {hist.count}')
+            lines.append(f'ctrlshift_handler_seconds_sum{{{labels}}} {hist.sum}')
+            lines.append(f'ctrlshift_handler_seconds_count{{{labels}}} {hist.count}')
+        lines.append('# TYPE ctrlshift_handler_errors_total counter')
+        for (kind, name), count in sorted(self.errors.items()):
+            lines.append(f'ctrlshift_handler_errors_total{{kind="{kind}",name="{name}"}} {count}')
+        lines.append('# TYPE ctrlshift_handler_in_flight gauge')
+        for (kind, name), count in sorted(self.in_flight.items()):
+            lines.append(f'ctrlshift_handler_in_flight{{kind="{kind}",name="{name}"}} {count}')
+        for name, value in sorted(self.gauges.items()):
+            lines.append(f'# TYPE ctrlshift_{name} gauge')
+            lines.append(f'ctrlshift_{name} {value}')
+        return '\n'.join(lines) + '\n'
+
+# Registre partagé par le bot et les modules
+registry = MetricsRegistry()
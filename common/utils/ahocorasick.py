@@ -0,0 +1,109 @@
+# Recherche simultanée d'un grand nombre de motifs littéraux (automate d'Aho-Corasick)
+from collections import deque
+from typing import Dict, Hashable, Iterator, List, Set, Tuple
+
+
+class AhoCorasick:
+    """Automate d'Aho-Corasick modifiable
+
+    Les ajouts et retraits modifient le trie sur place ; les liens d'échec sont recalculés pour tout l'automate
+    (en temps linéaire dans la taille du trie), paresseusement au prochain parcours et uniquement après un ajout,
+    un retrait ne changeant pas la structure.
+    Le coût d'un parcours est proportionnel à la longueur du texte et au nombre de correspondances,
+    indépendamment du nombre de motifs.
+    """
+
+    def __init__(self):
+        self._goto : List[Dict[str, int]] = [{}]
+        self._fail : List[int] = [0]
+        self._outputs : List[Set[Hashable]] = [set()]
+        self._depth : List[int] = [0]
+        self._terminal : List[bool] = [False]
+        self._dict_link : List[int] = [0]
+        self._dirty = False
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def add(self, pattern: str, value: Hashable):
+        """Ajoute un motif, associé à une valeur renvoyée lors des correspondances
+
+        :param pattern: Motif littéral (non vide)
+        :param value: Valeur associée (ex. identifiant du trigger)
+        """
+        if not pattern:
+            raise ValueError("pattern must not be empty")
+        node = 0
+        for char in pattern:
+            nxt = self._goto[node].get(char)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._outputs.append(set())
+                self._depth.append(self._depth[node] + 1)
+                self._terminal.append(False)
+                self._dict_link.append(0)
+                self._goto[node][char] = nxt
+                self._dirty = True
+            node = nxt
+        if not self._terminal[node]:
+            self._terminal[node] = True
+            self._dirty = True
+        if value not in self._outputs[node]:
+            self._outputs[node].add(value)
+            self._count += 1
+
+    def remove(self, pattern: str, value: Hashable) -> bool:
+        """Retire l'association motif -> valeur
+
+        :return: True si elle existait
+        """
+        node = 0
+        for char in pattern:
+            node = self._goto[node].get(char)
+            if node is None:
+                return False
+        if value in self._outputs[node]:
+            self._outputs[node].discard(value)
+            self._count -= 1
+            return True
+        return False
+
+    def _build(self):
+        queue = deque()
+        for child in self._goto[0].values():
+            self._fail[child] = 0
+            self._dict_link[child] = 0
+            queue.append(child)
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(char, 0)
+                self._fail[child] = target if target != child else 0
+                self._dict_link[child] = self._fail[child] if self._terminal[self._fail[child]] else self._dict_link[self._fail[child]]
+                queue.append(child)
+        self._dirty = False
+
+    def iter(self, text: str) -> Iterator[Tuple[int, int, Hashable]]:
+        """Parcourt le texte et renvoie les correspondances (début, fin, valeur) par ordre de fin
+
+        :param text: Texte à analyser
+        """
+        if self._dirty:
+            self._build()
+        goto, fail, outputs, dict_link, depth = self._goto, self._fail, self._outputs, self._dict_link, self._depth
+        node = 0
+        for i, char in enumerate(text):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            out = node
+            while out:
+                for value in outputs[out]:
+                    yield (i + 1 - depth[out], i + 1, value)
+                out = dict_link[out]
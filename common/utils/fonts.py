@@ -0,0 +1,37 @@
+# Cache partagé des polices utilisées pour le rendu des images
+import logging
+from functools import lru_cache
+from typing import Iterable, Tuple
+
+from PIL import ImageFont
+
+logger = logging.getLogger('ctrlshift.Fonts')
+
+FONT_CACHE_SIZE = 96
+
+@lru_cache(maxsize=FONT_CACHE_SIZE)
+def get_font(path: str, size: int, encoding: str = '') -> ImageFont.FreeTypeFont:
+    """Renvoie la police demandée, chargée une seule fois par processus tant qu'elle reste dans le cache (LRU)
+
+    :param path: Chemin du fichier de police
+    :param size: Taille en points
+    :param encoding: Encodage (ex. 'unic'), par défaut celui de la police
+    :return: ImageFont.FreeTypeFont
+    """
+    return ImageFont.truetype(path, size, encoding=encoding)
+
+def preload_fonts(specs: Iterable[Tuple[str, int, str]]) -> int:
+    """Charge à l'avance des polices dans le cache
+
+    :param specs: Polices à charger (chemin, taille, encodage)
+    :return: Nombre de polices chargées
+    """
+    loaded = 0
+    for path, size, encoding in specs:
+        try:
+            get_font(path, size, encoding)
+        except OSError as e:
+            logger.warning(f"Police '{path}' ({size}) impossible à charger : {e}")
+            continue
+        loaded += 1
+    return loaded
@@ -0,0 +1,162 @@
+# Mise en page de texte pour le rendu d'images (retour à la ligne et ajustement de la taille de police)
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from PIL import ImageFont
+
+from common.utils.fonts import get_font
+
+LINE_SPACING = 4 # Espacement entre les lignes, identique à celui par défaut de ImageDraw.multiline_text
+
+_advances : Dict[Tuple[str, int, str], Dict[str, float]] = {}
+
+
+class TextLayout(NamedTuple):
+    """Texte découpé en lignes pour une police donnée, avec ses dimensions"""
+    font: ImageFont.FreeTypeFont
+    lines: List[str]
+    width: float
+    height: float
+    truncated: bool = False # Texte coupé pour respecter le nombre maximal de lignes
+
+    @property
+    def text(self) -> str:
+        return '\n'.join(self.lines)
+
+
+def _glyph_advances(font: ImageFont.FreeTypeFont) -> Dict[str, float]:
+    key = (font.path, font.size, font.encoding)
+    if key not in _advances:
+        _advances[key] = {}
+    return _advances[key]
+
+def text_width(text: str, font: ImageFont.FreeTypeFont) -> float:
+    """Largeur d'une ligne de texte, calculée à partir des avances de chaque caractère (mises en cache par police)
+
+    :param text: Ligne de texte
+    :param font: Police
+    :return: Largeur en pixels (approchée : le crénage n'est pas pris en compte)
+    """
+    advances = _glyph_advances(font)
+    width = 0.0
+    for char in text:
+        advance = advances.get(char)
+        if advance is None:
+            advance = advances[char] = font.getlength(char)
+        width += advance
+    return width
+
+def wrap_text(text: str, font: ImageFont.FreeTypeFont, max_width: float, *, max_lines: Optional[int] = None, placeholder: str = '…') -> List[str]:
+    """Découpe un texte en lignes ne dépassant pas la largeur donnée (les retours à la ligne existants sont conservés)
+
+    :param text: Texte à découper
+    :param font: Police
+    :param max_width: Largeur maximale d'une ligne en pixels
+    :param max_lines: Nombre maximal de lignes, le texte est tronqué au-delà
+    :param placeholder: Marque ajoutée à la fin d'un texte tronqué
+    :return: Liste des lignes
+    """
+    space = text_width(' ', font)
+    lines = []
+    for paragraph in text.split('\n'):
+        line, line_width = '', 0.0
+        for word in paragraph.split(' '):
+            word_width = text_width(word, font)
+            while word_width > max_width and len(word) > 1:
+                # Mot trop long pour une ligne entière : on le coupe comme le ferait textwrap
+                if line:
+                    lines.append(line)
+                cut = 1
+                while cut < len(word) - 1 and text_width(word[:cut + 1], font) <= max_width:
+                    cut += 1
+                line, line_width = '', 0.0
+                lines.append(word[:cut])
+                word = word[cut:]
+                word_width = text_width(word, font)
+            if line and line_width + space + word_width > max_width:
+                lines.append(line)
+                line, line_width = word, word_width
+            else:
+                line_width += (space if line else 0) + word_width
+                line = f'{line} {word}' if line else word
+        lines.append(line)
+
+    if max_lines and len(lines) > max_lines:
+        lines = _truncate_lines(lines, font, max_width, max_lines, placeholder)
+    return lines
+
+def _truncate_lines(lines: List[str], font: ImageFont.FreeTypeFont, max_width: float, max_lines: int, placeholder: str) -> List[str]:
+    lines = lines[:max_lines]
+    last = lines[-1]
+    while last and text_width(last + placeholder, font) > max_width:
+        last = last.rsplit(' ', 1)[0] if ' ' in last else last[:-1]
+    lines[-1] = last + placeholder
+    return lines
+
+def layout_text(text: str, font: ImageFont.FreeTypeFont, max_width: float, *, max_lines: Optional[int] = None, spacing: int = LINE_SPACING) -> TextLayout:
+    """Découpe le texte et mesure le bloc obtenu
+
+    :param text: Texte
+    :param font: Police
+    :param max_width: Largeur maximale d'une ligne en pixels
+    :param max_lines: Nombre maximal de lignes
+    :param spacing: Espacement entre les lignes
+    :return: TextLayout
+    """
+    lines = wrap_text(text, font, max_width)
+    truncated = bool(max_lines) and len(lines) > max_lines
+    if truncated:
+        lines = _truncate_lines(lines, font, max_width, max_lines, '…')
+    ascent, descent = font.getmetrics()
+    line_height = font.getbbox('A')[3] + spacing
+    width = max(text_width(line, font) for line in lines)
+    height = line_height * (len(lines) - 1) + ascent + descent
+    return TextLayout(font, lines, width, height, truncated)
+
+def probe_sizes(min_size: int, max_size: int, depth: int = 3) -> List[int]:
+    """Tailles essayées en premier par fit_text(), quel que soit le texte (les premiers niveaux de la dichotomie)
+    Utile pour précharger les polices qui serviront à coup sûr
+
+    :param min_size: Taille de police minimale
+    :param max_size: Taille de police maximale
+    :param depth: Nombre d'étapes de la dichotomie
+    :return: Liste des tailles
+    """
+    sizes, ranges = [], [(min_size, max_size)]
+    for _ in range(depth):
+        next_ranges = []
+        for low, high in ranges:
+            if low > high:
+                continue
+            size = (low + high) // 2
+            sizes.append(size)
+            next_ranges += [(low, size - 1), (size + 1, high)]
+        ranges = next_ranges
+    return sizes
+
+def fit_text(text: str, font_path: str, max_width: float, max_height: float, *, max_size: int, min_size: int = 8, encoding: str = '', max_lines: Optional[int] = None, spacing: int = LINE_SPACING) -> TextLayout:
+    """Trouve par dichotomie la plus grande taille de police pour laquelle le texte découpé tient entièrement dans le cadre
+    Chaque taille essayée n'est mise en page et mesurée qu'une fois. Une mise en page tronquée (max_lines) ne compte pas comme
+    tenant dans le cadre : le texte n'est tronqué que s'il dépasse même à la taille minimale
+
+    :param text: Texte
+    :param font_path: Chemin du fichier de police
+    :param max_width: Largeur du cadre en pixels
+    :param max_height: Hauteur du cadre en pixels
+    :param max_size: Taille de police maximale
+    :param min_size: Taille de police minimale (utilisée, texte tronqué si besoin, quand le texte ne tient pas)
+    :param encoding: Encodage de la police
+    :param max_lines: Nombre maximal de lignes
+    :param spacing: Espacement entre les lignes
+    :return: TextLayout
+    """
+    best = None
+    low, high = min_size, max_size
+    while low <= high:
+        size = (low + high) // 2
+        layout = layout_text(text, get_font(font_path, size, encoding), max_width, max_lines=max_lines, spacing=spacing)
+        if not layout.truncated and layout.width <= max_width and layout.height <= max_height:
+            best = layout
+            low = size + 1
+        else:
+            high = size - 1
+    return best or layout_text(text, get_font(font_path, min_size, encoding), max_width, max_lines=max_lines, spacing=spacing)
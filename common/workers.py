@@ -0,0 +1,103 @@
+import asyncio
+import logging
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from common.metrics import registry as metrics
+
+logger = logging.getLogger('ctrlshift.Workers')
+
+DEFAULT_MAX_WORKERS = 2
+
+_process_pool : Optional[ProcessPoolExecutor] = None
+_pending = 0 # Tâches soumises au pool et pas encore terminées
+_initializers : Dict[str, Tuple[Callable, tuple]] = {} # Fonctions exécutées au démarrage de chaque processus de travail
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """Renvoie le pool de processus partagé par les modules pour les tâches lourdes (rendu d'images...)
+    Il est créé au premier appel
+
+    :return: ProcessPoolExecutor
+    """
+    global _process_pool
+    if _process_pool is None:
+        _process_pool = ProcessPoolExecutor(max_workers=DEFAULT_MAX_WORKERS, initializer=_initialize_worker, initargs=(tuple(_initializers.values()),))
+    return _process_pool
+
+def _initialize_worker(initializers: Tuple[Tuple[Callable, tuple], ...]):
+    """Exécutée au démarrage de chaque processus de travail (une erreur ici casserait tout le pool, elle est donc seulement journalisée)"""
+    for func, args in initializers:
+        try:
+            func(*args)
+        except Exception as e:
+            logger.warning(f"Initialisation du processus de travail ({getattr(func, '__name__', func)}) : {e}")
+
+def register_initializer(name: str, func: Callable, *args):
+    """Enregistre une fonction à exécuter au démarrage de chaque processus de travail (ex. préchargement de polices)
+    Si le pool existe déjà, il est remplacé pour que tous ses processus en profitent (les tâches en cours se terminent normalement)
+
+    :param name: Nom de l'initialisation, un nouvel enregistrement sous le même nom remplace le précédent
+    :param func: Fonction à exécuter, sérialisable comme pour run_in_process()
+    """
+    global _process_pool
+    _initializers[name] = (func, args)
+    if _process_pool is not None:
+        _process_pool.shutdown(wait=False)
+        _process_pool = None
+
+def _discard_process_pool(pool: ProcessPoolExecutor):
+    """Abandonne un pool cassé (processus de travail tué, mémoire épuisée...) pour qu'un nouveau soit créé au prochain appel
+
+    :param pool: Pool qui a échoué
+    """
+    global _process_pool
+    if _process_pool is pool: # Un autre appel a pu le remplacer entre-temps
+        _process_pool = None
+        logger.warning("Pool de processus cassé, il sera recréé")
+    pool.shutdown(wait=False, cancel_futures=True)
+
+def _timed_call(func: Callable, args: tuple, kwargs: dict) -> Tuple[float, Any]:
+    """Exécutée dans le processus de travail : renvoie l'instant de démarrage avec le résultat"""
+    return time.time(), func(*args, **kwargs)
+
+def _set_queue_depth():
+    metrics.set_gauge('worker_pending', _pending)
+    metrics.set_gauge('worker_queue_depth', max(0, _pending - DEFAULT_MAX_WORKERS))
+
+async def run_in_process(func: Callable, *args, **kwargs) -> Any:
+    """Exécute une fonction dans le pool de processus sans bloquer la boucle d'événements
+    La fonction et ses arguments doivent être sérialisables (fonction de module, bytes, tuples...)
+
+    Si le pool est cassé, il est recréé et la tâche est relancée une fois
+
+    Mesures : durée totale ('worker'), attente dans la file ('worker_wait') et nombre de tâches en attente
+
+    :param func: Fonction à exécuter
+    :return: Résultat de la fonction
+    """
+    global _pending
+    loop = asyncio.get_running_loop()
+    name = getattr(func, '__name__', 'task')
+    submitted = time.time()
+    _pending += 1
+    _set_queue_depth()
+    try:
+        with metrics.track('worker', name):
+            pool = get_process_pool()
+            try:
+                started, result = await loop.run_in_executor(pool, _timed_call, func, args, kwargs)
+            except BrokenProcessPool:
+                _discard_process_pool(pool)
+                pool = get_process_pool()
+                try:
+                    started, result = await loop.run_in_executor(pool, _timed_call, func, args, kwargs)
+                except BrokenProcessPool:
+                    _discard_process_pool(pool) # La tâche elle-même fait probablement tomber le processus
+                    raise
+    finally:
+        _pending -= 1
+        _set_queue_depth()
+    metrics.observe('worker_wait', name, max(0.0, started - submitted))
+    return result
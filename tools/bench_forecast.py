@@ -0,0 +1,111 @@
+# Test de charge hors-ligne du module Forecast contre le serveur local tools/owm_mock.py
+#
+# Usage : python tools/bench_forecast.py --concurrency 300 --rounds 3 --cities 40 --latency 0.15
+# Chaque tour lance <concurrency> commandes /weather current et /weather week simultanées,
+# avec une distribution de villes de type Zipf (quelques villes concentrent la majorité des demandes)
+import argparse
+import asyncio
+import random
+import statistics
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from tabulate import tabulate
+
+from cogs.forecast import Forecast
+from tools.owm_mock import MockOWM
+
+
+class BenchBot:
+    """Remplaçant minimal de commands.Bot pour instancier le cog hors connexion"""
+
+    def __init__(self, api_url: str):
+        self.config = {'OWM_API_URL': api_url}
+        self._ready = asyncio.Event()
+
+    async def wait_until_ready(self):
+        await self._ready.wait()
+
+
+class BenchForecast(Forecast):
+    def get_setting(self, name: str):
+        return 'bench-key' if name == 'OWMAPIKey' else None
+
+
+class BenchResponse:
+    def __init__(self):
+        self.sent = None
+
+    async def send_message(self, content=None, **kwargs):
+        self.sent = content or kwargs.get('embed')
+
+
+class BenchInteraction:
+    def __init__(self):
+        self.response = BenchResponse()
+
+
+async def invoke(cog: Forecast, command: str, city: str) -> tuple:
+    callback = Forecast.forecast_current.callback if command == 'current' else Forecast.forecast_week.callback
+    interaction = BenchInteraction()
+    start = time.perf_counter()
+    try:
+        await callback(cog, interaction, city)
+        ok = not isinstance(interaction.response.sent, str)
+    except Exception:
+        ok = False
+    return time.perf_counter() - start, ok
+
+
+def percentile(values: list, p: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+async def run(args):
+    mock = MockOWM(args.latency, args.jitter, args.error_rate)
+    runner = await mock.start(port=args.port)
+    cog = BenchForecast(BenchBot(f'http://127.0.0.1:{args.port}'))
+    await cog.cog_load()
+
+    cities = [f'Ville{i}' for i in range(args.cities)]
+    weights = [1 / (i + 1) for i in range(args.cities)]
+    rows = []
+    try:
+        for n in range(args.rounds):
+            before = Counter(mock.hits)
+            picks = random.choices(cities, weights, k=args.concurrency)
+            commands = random.choices(['current', 'week'], k=args.concurrency)
+            start = time.perf_counter()
+            results = await asyncio.gather(*(invoke(cog, c, city) for c, city in zip(commands, picks)))
+            elapsed = time.perf_counter() - start
+            latencies = [r[0] * 1000 for r in results]
+            hits = Counter(mock.hits)
+            hits.subtract(before)
+            rows.append([n + 1, args.concurrency, f'{elapsed:.2f}s', f'{statistics.median(latencies):.1f}', f'{percentile(latencies, 0.95):.1f}', f'{max(latencies):.1f}',
+                         sum(1 for r in results if not r[1]), hits['/geo/1.0/direct'], hits['/data/2.5/weather'], hits['/data/2.5/forecast']])
+    finally:
+        cog.cog_unload()
+        await runner.cleanup()
+
+    print(tabulate(rows, headers=['Tour', 'Commandes', 'Durée', 'p50 (ms)', 'p95 (ms)', 'max (ms)', 'Échecs', 'Appels geo', 'Appels weather', 'Appels forecast']))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Test de charge hors-ligne du module Forecast")
+    parser.add_argument('--concurrency', type=int, default=300, help="Commandes simultanées par tour")
+    parser.add_argument('--rounds', type=int, default=3, help="Nombre de tours (le premier part d'un cache vide)")
+    parser.add_argument('--cities', type=int, default=40, help="Nombre de villes distinctes")
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--latency', type=float, default=0.15)
+    parser.add_argument('--jitter', type=float, default=0.05)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+# Télécharge l'index des villes utilisé par l'autocomplétion du module Forecast
+#
+# Usage : python tools/fetch_gazetteer.py [--dataset cities15000]
+# Récupère l'export GeoNames, n'en garde que les colonnes lues par Gazetteer.load() (les autres sont vidées pour alléger
+# le fichier sans changer son format) et l'enregistre dans cogs/packages/forecast/, où le module le charge au démarrage
+import argparse
+import io
+import sys
+import urllib.request
+import zipfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from cogs.forecast import GAZETTEER_FILE
+from common.dataio import get_package_path
+
+GEONAMES_URL = 'https://download.geonames.org/export/dump/{}.zip'
+KEPT_COLUMNS = (0, 1, 2, 4, 5, 8, 14) # ID, nom, nom ASCII, latitude, longitude, pays, population
+
+
+def trim_line(line: str) -> str:
+    cols = line.rstrip('\n').split('\t')
+    return '\t'.join(c if i in KEPT_COLUMNS else '' for i, c in enumerate(cols)) + '\n'
+
+def main():
+    parser = argparse.ArgumentParser(description="Téléchargement de l'index des villes du module Forecast")
+    parser.add_argument('--dataset', default=Path(GAZETTEER_FILE).stem, help="Export GeoNames (cities500, cities1000, cities5000, cities15000)")
+    parser.add_argument('--output', type=Path, default=Path(get_package_path('forecast')) / GAZETTEER_FILE)
+    args = parser.parse_args()
+
+    url = GEONAMES_URL.format(args.dataset)
+    print(f"Téléchargement de {url}...")
+    with urllib.request.urlopen(url) as resp:
+        archive = zipfile.ZipFile(io.BytesIO(resp.read()))
+
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    count = 0
+    with archive.open(f'{args.dataset}.txt') as src, open(args.output, 'w', encoding='utf-8') as dst:
+        for line in io.TextIOWrapper(src, encoding='utf-8'):
+            dst.write(trim_line(line))
+            count += 1
+    print(f"{count} villes enregistrées dans {args.output}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+# Serveur local imitant l'API OpenWeatherMap pour tester Forecast sans clé réelle
+#
+# Usage : python tools/owm_mock.py --port 8089 --latency 0.15 --jitter 0.05 --error-rate 0.02
+# Puis ajouter OWM_API_URL=http://127.0.0.1:8089 dans le .env du bot
+import argparse
+import asyncio
+import copy
+import json
+import random
+import time
+import zlib
+from collections import Counter
+from pathlib import Path
+
+from aiohttp import web
+
+FIXTURES_PATH = Path(__file__).parent / 'fixtures' / 'owm'
+
+
+def load_fixtures() -> dict:
+    return {name: json.loads((FIXTURES_PATH / f'{name}.json').read_text(encoding='utf-8')) for name in ('geocode', 'weather', 'forecast')}
+
+
+def fake_coordinates(city: str) -> tuple:
+    """Coordonnées stables et distinctes pour chaque nom de ville"""
+    h = zlib.crc32(city.lower().encode())
+    return (round(-60 + (h % 12000) / 100, 4), round(-180 + (h // 12000 % 36000) / 100, 4))
+
+
+class MockOWM:
+    """Application aiohttp servant les fixtures enregistrées avec latence et erreurs configurables"""
+
+    def __init__(self, latency: float = 0.1, jitter: float = 0.0, error_rate: float = 0.0, error_status: int = 500):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.fixtures = load_fixtures()
+        self.hits = Counter()
+
+        self.app = web.Application(middlewares=[self.simulate])
+        self.app.router.add_get('/geo/1.0/direct', self.geocode)
+        self.app.router.add_get('/data/2.5/weather', self.weather)
+        self.app.router.add_get('/data/2.5/forecast', self.forecast)
+        self.app.router.add_get('/_stats', self.stats)
+
+    @web.middleware
+    async def simulate(self, request: web.Request, handler):
+        if request.path == '/_stats':
+            return await handler(request)
+        self.hits[request.path] += 1
+        await asyncio.sleep(max(0.0, self.latency + random.uniform(-self.jitter, self.jitter)))
+        if 'appid' not in request.query:
+            return web.json_response({'cod': 401, 'message': 'Invalid API key.'}, status=401)
+        if self.error_rate and random.random() < self.error_rate:
+            return web.json_response({'cod': self.error_status, 'message': 'Simulated error'}, status=self.error_status)
+        return await handler(request)
+
+    async def geocode(self, request: web.Request) -> web.Response:
+        city, _, country = request.query.get('q', '').partition(',')
+        if not city:
+            return web.json_response({'cod': '400', 'message': 'Nothing to geocode'}, status=400)
+        data = copy.deepcopy(self.fixtures['geocode'])
+        lat, lon = fake_coordinates(city)
+        data[0].update({'name': city.title(), 'lat': lat, 'lon': lon, 'country': country.upper() or data[0]['country']})
+        data[0]['local_names']['fr'] = city.title()
+        return web.json_response(data)
+
+    async def weather(self, request: web.Request) -> web.Response:
+        data = copy.deepcopy(self.fixtures['weather'])
+        data['coord'] = {'lat': float(request.query.get('lat', 0)), 'lon': float(request.query.get('lon', 0))}
+        data['dt'] = int(time.time())
+        return web.json_response(data)
+
+    async def forecast(self, request: web.Request) -> web.Response:
+        data = copy.deepcopy(self.fixtures['forecast'])
+        data['city']['coord'] = {'lat': float(request.query.get('lat', 0)), 'lon': float(request.query.get('lon', 0))}
+        start = int(time.time()) // 10800 * 10800 + 10800
+        for i, item in enumerate(data['list']):
+            item['dt'] = start + i * 10800
+        return web.json_response(data)
+
+    async def stats(self, request: web.Request) -> web.Response:
+        return web.json_response(dict(self.hits))
+
+    async def start(self, host: str = '127.0.0.1', port: int = 8089) -> web.AppRunner:
+        """Démarre le serveur dans la boucle courante et renvoie le runner"""
+        runner = web.AppRunner(self.app)
+        await runner.setup()
+        site = web.TCPSite(runner, host, port)
+        await site.start()
+        return runner
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serveur local imitant l'API OpenWeatherMap")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--latency', type=float, default=0.1, help="Latence moyenne par requête (secondes)")
+    parser.add_argument('--jitter', type=float, default=0.0, help="Variation aléatoire de la latence (secondes)")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Proportion de requêtes en erreur (0-1)")
+    parser.add_argument('--error-status', type=int, default=500, help="Code HTTP des erreurs simulées (ex. 429)")
+    args = parser.parse_args()
+
+    mock = MockOWM(args.latency, args.jitter, args.error_rate, args.error_status)
+    web.run_app(mock.app, host=args.host, port=args.port)
+
+
+if __name__ == '__main__':
+    main()